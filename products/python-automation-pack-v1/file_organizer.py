@@ -7,13 +7,47 @@ Usage:
     python file_organizer.py /path/to/folder --mode type
     python file_organizer.py /path/to/folder --mode both
     python file_organizer.py /path/to/folder --dry-run
+    python file_organizer.py /path/to/folder --timing
+    python file_organizer.py /path/to/folder --rules my_rules.json
+    python file_organizer.py /path/to/folder --workers 16
+    python file_organizer.py /path/to/folder --resume    # finish an interrupted run
+    python file_organizer.py /path/to/folder --undo      # put the last run's files back
+    python file_organizer.py /path/to/folder --watch     # keep organizing new arrivals
+    python file_organizer.py /path/to/folder --dedup skip
+    python file_organizer.py /path/to/folder --recursive --dry-run --plan-file plan.jsonl
+
+Rules file (JSON): rules are checked in order and the first match wins; files
+no rule matches fall back to FILE_TYPE_MAP. All conditions in a rule must hold.
+    {"rules": [
+        {"category": "Screenshots", "glob": "Screenshot*.png"},
+        {"category": "Invoices", "regex": "(?i)^invoice[-_ ]?\\d+", "extensions": [".pdf"]},
+        {"category": "Videos/Large", "extensions": [".mp4", ".mov"], "min_size": "500MB"},
+        {"category": "Images", "mime": "image/*"}
+    ]}
 """
 
 import os
+import re
+import sys
+import json
+import stat
+import errno
+import sqlite3
+import hashlib
+import ctypes
+import ctypes.util
+import select
 import shutil
+import struct
+import fnmatch
 import argparse
+import time
+import itertools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
+from typing import NamedTuple
 
 FILE_TYPE_MAP = {
     "Images":     [".jpg", ".jpeg", ".png", ".gif", ".bmp", ".svg", ".webp", ".heic", ".tiff"],
@@ -29,74 +63,1008 @@ FILE_TYPE_MAP = {
 }
 
 
+EXTENSION_INDEX = {ext: category for category, exts in FILE_TYPE_MAP.items() for ext in exts}
+
+# (offset, bytes) pairs that must all match, and the MIME type they identify.
+MAGIC_SIGNATURES = [
+    (((0, b"\x89PNG\r\n\x1a\n"),), "image/png"),
+    (((0, b"\xff\xd8\xff"),), "image/jpeg"),
+    (((0, b"GIF87a"),), "image/gif"),
+    (((0, b"GIF89a"),), "image/gif"),
+    (((0, b"BM"),), "image/bmp"),
+    (((0, b"II*\x00"),), "image/tiff"),
+    (((0, b"MM\x00*"),), "image/tiff"),
+    (((0, b"RIFF"), (8, b"WEBP")), "image/webp"),
+    (((0, b"RIFF"), (8, b"WAVE")), "audio/wav"),
+    (((0, b"RIFF"), (8, b"AVI ")), "video/x-msvideo"),
+    (((0, b"ID3"),), "audio/mpeg"),
+    (((0, b"fLaC"),), "audio/flac"),
+    (((0, b"OggS"),), "audio/ogg"),
+    (((4, b"ftyp"),), "video/mp4"),
+    (((0, b"\x1a\x45\xdf\xa3"),), "video/x-matroska"),
+    (((0, b"%PDF-"),), "application/pdf"),
+    (((0, b"PK\x03\x04"),), "application/zip"),
+    (((0, b"\x1f\x8b"),), "application/gzip"),
+    (((0, b"BZh"),), "application/x-bzip2"),
+    (((0, b"7z\xbc\xaf\x27\x1c"),), "application/x-7z-compressed"),
+    (((0, b"Rar!\x1a\x07"),), "application/vnd.rar"),
+    (((0, b"SQLite format 3\x00"),), "application/vnd.sqlite3"),
+    (((0, b"\x7fELF"),), "application/x-executable"),
+    (((0, b"MZ"),), "application/x-msdownload"),
+]
+
+# Concurrent full copies when --workers moves cross a filesystem boundary.
+COPY_WORKERS = 2
+# --workers moves queued per worker, ahead of the one being reported.
+QUEUED_PER_WORKER = 4
+
+# Every run is recorded here (inside the organized folder) for --resume and --undo.
+JOURNAL_FILE = ".file_organizer_journal.jsonl"
+# Planned moves are written and fsynced this many at a time, before any of them run.
+JOURNAL_BATCH = 500
+
+# --dedup compares files of equal size by their first block, then in full.
+HASH_BLOCK = 1024 * 1024
+PARTIAL_BYTES = 64 * 1024
+# Digests survive between runs, keyed by inode so organized (renamed) files keep theirs.
+HASH_CACHE = Path.home() / ".cache" / "file_organizer" / "hashes.db"
+
+# --watch moves a new file once nothing has touched it for this many seconds,
+# so downloads and copies still being written are left alone.
+WATCH_SETTLE = 2.0
+# Polling interval when inotify is unavailable (non-Linux) or --poll-interval is given.
+WATCH_POLL = 5.0
+# Temporary names browsers and download tools use until a file is complete.
+PARTIAL_SUFFIXES = (".part", ".partial", ".crdownload", ".download", ".tmp", ".swp")
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+INOTIFY_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len; followed by the name
+
+# Recursive runs probe the disk for name clashes; destinations claimed this
+# recently may still be queued for moving, so they are remembered as well.
+# The window is this plus the --workers queue (see collision_window()), and
+# this part must exceed JOURNAL_BATCH.
+COLLISION_WINDOW = 4 * JOURNAL_BATCH
+
+SIZE_UNITS = {"": 1, "B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3, "TB": 1024 ** 4}
+
+
 def get_file_type(extension: str) -> str:
-    ext = extension.lower()
-    for category, extensions in FILE_TYPE_MAP.items():
-        if ext in extensions:
-            return category
-    return "Others"
+    return EXTENSION_INDEX.get(extension.lower(), "Others")
+
+
+def sniff_mime(path: str) -> str | None:
+    try:
+        with open(path, "rb") as f:
+            head = f.read(32)
+    except OSError:
+        return None
+    for parts, mime in MAGIC_SIGNATURES:
+        if all(head[offset:offset + len(magic)] == magic for offset, magic in parts):
+            return mime
+    return None
+
+
+def format_size(size: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def parse_size(value) -> int:
+    if isinstance(value, int):
+        return value
+    m = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?B?)\s*", str(value).upper())
+    if not m:
+        raise ValueError(f"bad size '{value}' (use e.g. 1048576, '500KB' or '2GB')")
+    return int(float(m.group(1)) * SIZE_UNITS[m.group(2)])
+
+
+class Rule(NamedTuple):
+    order: int
+    category: str
+    glob_re: re.Pattern | None
+    name_re: re.Pattern | None
+    extensions: frozenset | None
+    min_size: int | None
+    max_size: int | None
+    mime: str | None
+
+
+class RuleSet:
+    """Classification rules compiled once from a rules file.
+
+    Rules are bucketed by the extensions they can apply to, so classifying a
+    file only looks at the rules for its extension plus the few rules that
+    apply to any extension, however large the rule set grows.
+    """
+
+    KEYS = {"category", "glob", "regex", "extensions", "min_size", "max_size", "mime"}
+
+    def __init__(self, rules: list[dict]):
+        self.by_extension = {}
+        self.generic = []
+        self.categories = []
+        self.needs_stat = False
+        for order, spec in enumerate(rules):
+            if not isinstance(spec, dict) or not spec.get("category"):
+                raise ValueError(f"rule {order + 1} needs a \"category\"")
+            unknown = set(spec) - self.KEYS
+            if unknown:
+                raise ValueError(f"rule {order + 1} has unknown key(s): {', '.join(sorted(unknown))}")
+            if not set(spec) - {"category"}:
+                raise ValueError(f"rule {order + 1} has no conditions")
+            try:
+                glob_re = re.compile(fnmatch.translate(spec["glob"]), re.IGNORECASE) if "glob" in spec else None
+                name_re = re.compile(spec["regex"]) if "regex" in spec else None
+            except re.error as e:
+                raise ValueError(f"rule {order + 1} has a bad pattern: {e}") from None
+            extensions = None
+            if "extensions" in spec:
+                extensions = frozenset(e.lower() if e.startswith(".") else "." + e.lower() for e in spec["extensions"])
+            rule = Rule(
+                order, spec["category"], glob_re, name_re, extensions,
+                parse_size(spec["min_size"]) if "min_size" in spec else None,
+                parse_size(spec["max_size"]) if "max_size" in spec else None,
+                spec.get("mime"),
+            )
+            self.categories.append(rule.category)
+            self.needs_stat |= rule.min_size is not None or rule.max_size is not None
+
+            keys = extensions
+            glob_ext = re.fullmatch(r"\*(\.[^*?\[\]/]+)", spec.get("glob", ""))
+            if keys is None and glob_ext:
+                # classify() looks rules up by the last suffix only ("*.tar.gz" -> ".gz").
+                keys = {"." + glob_ext.group(1).rsplit(".", 1)[1].lower()}
+            if keys is None:
+                self.generic.append(rule)
+            else:
+                for ext in keys:
+                    self.by_extension.setdefault(ext, []).append(rule)
+
+    def _candidates(self, ext: str):
+        bucket = self.by_extension.get(ext, ())
+        if not bucket:
+            return self.generic
+        if not self.generic:
+            return bucket
+        return sorted([*bucket, *self.generic], key=lambda r: r.order)
+
+    def classify(self, name: str, path: str, size: int | None) -> str:
+        ext = os.path.splitext(name)[1].lower()
+        mime = None
+        for rule in self._candidates(ext):
+            if rule.extensions is not None and ext not in rule.extensions:
+                continue
+            if rule.glob_re is not None and not rule.glob_re.match(name):
+                continue
+            if rule.name_re is not None and not rule.name_re.search(name):
+                continue
+            if rule.min_size is not None and (size is None or size < rule.min_size):
+                continue
+            if rule.max_size is not None and (size is None or size > rule.max_size):
+                continue
+            if rule.mime is not None:
+                if mime is None:
+                    mime = sniff_mime(path) or ""
+                if not fnmatch.fnmatchcase(mime, rule.mime):
+                    continue
+            return rule.category
+        return EXTENSION_INDEX.get(ext, "Others")
+
+
+def load_rules(path: Path) -> RuleSet:
+    try:
+        config = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError) as e:
+        raise ValueError(str(e)) from None
+    rules = config.get("rules") if isinstance(config, dict) else config
+    if not isinstance(rules, list):
+        raise ValueError('expected {"rules": [...]}')
+    return RuleSet(rules)
+
+
+def format_file_date(mtime: float) -> str:
+    return datetime.fromtimestamp(mtime).strftime("%Y/%m")
 
 
 def get_file_date(filepath: Path) -> str:
-    timestamp = filepath.stat().st_mtime
-    return datetime.fromtimestamp(timestamp).strftime("%Y/%m")
+    return format_file_date(filepath.stat().st_mtime)
 
 
-def organize_by_type(folder: Path, dry_run: bool) -> int:
-    moved = 0
-    for item in folder.iterdir():
-        if item.is_dir():
-            continue
-        category = get_file_type(item.suffix)
-        dest_dir = folder / category
-        dest = dest_dir / item.name
-        if dry_run:
-            print(f"  [DRY RUN] {item.name} → {category}/")
+class PlannedMove(NamedTuple):
+    name: str
+    src: Path
+    dest_dir: str  # relative to the folder being organized, e.g. "Images/2024/01"
+    st: os.stat_result | None  # None when the mode did not need it
+
+
+def organized_folders(mode: str, rules: RuleSet | None = None):
+    """Predicate for the top-level folder names this mode moves files into."""
+    roots = set()
+    if mode != "date":
+        roots = set(FILE_TYPE_MAP) | {"Others"}
+        if rules is not None:
+            roots.update(category.split("/")[0] for category in rules.categories)
+    if mode == "type":
+        return roots.__contains__
+    return lambda name: name in roots or (len(name) == 4 and name.isdigit())
+
+
+def iter_files(folder: Path, need_stat: bool, recursive: bool = False, skip=None):
+    # DirEntry.is_dir() answers from the directory listing itself on most
+    # platforms and DirEntry.stat() is cached, so each file costs at most one
+    # stat call (none at all when sorting by type only). Recursive walks keep
+    # only the stack of folders still to visit, never a list of files.
+    stack = [folder]
+    while stack:
+        top = stack.pop()
+        with os.scandir(top) as it:
+            for entry in it:
+                if entry.is_dir():
+                    if recursive and not entry.is_symlink() and not (top == folder and skip and skip(entry.name)):
+                        stack.append(Path(entry.path))
+                    continue
+                if entry.name == JOURNAL_FILE:
+                    continue
+                yield entry, entry.stat() if need_stat else None
+
+
+def scan_folder(folder: Path, need_stat: bool) -> list[tuple[os.DirEntry, os.stat_result | None]]:
+    return list(iter_files(folder, need_stat))
+
+
+def classify(entry: os.DirEntry, st: os.stat_result | None, rules: RuleSet | None) -> str:
+    if rules is None:
+        return get_file_type(os.path.splitext(entry.name)[1])
+    return rules.classify(entry.name, entry.path, st.st_size if st else None)
+
+
+def iter_moves(entries, mode: str, rules: RuleSet | None = None):
+    for entry, st in entries:
+        if mode == "type":
+            dest_dir = classify(entry, st, rules)
+        elif mode == "date":
+            dest_dir = format_file_date(st.st_mtime)
         else:
-            dest_dir.mkdir(exist_ok=True)
-            shutil.move(str(item), str(dest))
-            print(f"  Moved: {item.name} → {category}/")
+            dest_dir = f"{classify(entry, st, rules)}/{format_file_date(st.st_mtime)}"
+        yield PlannedMove(entry.name, Path(entry.path), dest_dir, st)
+
+
+def plan_moves(entries, mode: str, rules: RuleSet | None = None) -> list[PlannedMove]:
+    return list(iter_moves(entries, mode, rules))
+
+
+def collision_window(workers: int) -> int:
+    return COLLISION_WINDOW + QUEUED_PER_WORKER * max(workers, 1)
+
+
+def avoid_collisions(folder: Path, moves, window: int = COLLISION_WINDOW):
+    """Give a "name (n).ext" name to moves whose destination is already taken.
+
+    `window` is how many planned moves may not have reached the disk yet.
+    """
+    claimed = set()
+    recent = deque()
+    for move in moves:
+        name = move.name
+        stem, ext = os.path.splitext(name)
+        n = 0
+        while f"{move.dest_dir}/{name}" in claimed or os.path.lexists(folder / move.dest_dir / name):
+            n += 1
+            name = f"{stem} ({n}){ext}"
+        dest = f"{move.dest_dir}/{name}"
+        claimed.add(dest)
+        recent.append(dest)
+        if len(recent) > window:
+            claimed.discard(recent.popleft())
+        yield move._replace(name=name) if n else move
+
+
+def write_plan(moves, path: Path, folder: Path):
+    with open(path, "w", encoding="utf-8") as f:
+        for move in moves:
+            f.write(json.dumps({
+                "src": os.path.relpath(move.src, folder),
+                "dest": f"{move.dest_dir}/{move.name}",
+                "size": move.st.st_size if move.st else None,
+            }) + "\n")
+            yield move
+
+
+def summarize_moves(moves, mode: str) -> int:
+    by_category = {}
+    by_date = {}
+    count = 0
+    for move in moves:
+        size = move.st.st_size if move.st else 0
+        if mode != "date":
+            category = move.dest_dir if mode == "type" else move.dest_dir.rsplit("/", 2)[0]
+            totals = by_category.setdefault(category, [0, 0])
+            totals[0] += 1
+            totals[1] += size
+        if move.st is not None:
+            totals = by_date.setdefault(format_file_date(move.st.st_mtime), [0, 0])
+            totals[0] += 1
+            totals[1] += size
+        count += 1
+    for title, table in (("Category", by_category), ("Date", by_date)):
+        if not table:
+            continue
+        print(f"  {title:<24} {'Files':>10} {'Size':>12}")
+        for key, (files, size) in sorted(table.items()):
+            print(f"  {key:<24} {files:>10,} {format_size(size):>12}")
+        print()
+    return count
+
+
+def open_journal(folder: Path):
+    """Open the journal for appending, first cutting off a torn final line
+    left by a crash so the next record starts on a line of its own."""
+    path = folder / JOURNAL_FILE
+    with open(path, "ab+") as f:
+        size = end = f.seek(0, os.SEEK_END)
+        keep = 0
+        while end > 0:
+            start = max(0, end - 4096)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline >= 0:
+                keep = start + newline + 1
+                break
+            end = start
+        if keep < size:
+            f.truncate(keep)
+    return open(path, "a", encoding="utf-8")
+
+
+class Journal:
+    """Append-only write-ahead log of one organize run.
+
+    Moves are planned in batches: the batch's "plan" records are fsynced
+    before any of its files move, and "done" records are appended as moves
+    finish and reach disk with the next batch's fsync. After a crash, a move
+    without a durable "done" record is settled by checking which of its two
+    paths exists.
+    """
+
+    def __init__(self, folder: Path, mode: str, run_id: str | None = None):
+        self.folder = folder
+        self.run = run_id or datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        self.next_index = 0
+        self._pending = {}  # src path -> index, for moves planned but not yet done
+        self._file = open_journal(folder)
+        if run_id is None:
+            self._write({"op": "begin", "mode": mode, "time": datetime.now().isoformat(timespec="seconds")})
+
+    def _write(self, record: dict):
+        self._file.write(json.dumps({"run": self.run, **record}) + "\n")
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def plan(self, moves: list) -> list:
+        for move in moves:
+            self._write({
+                "op": "plan", "i": self.next_index,
+                "src": Path(move.src).relative_to(self.folder).as_posix(),
+                "dest": f"{move.dest_dir}/{move.name}",
+            })
+            self._pending[str(move.src)] = self.next_index
+            self.next_index += 1
+        self.sync()
+        return moves
+
+    def track(self, move, index: int):
+        self._pending[str(move.src)] = index
+
+    def done(self, move):
+        self._write({"op": "done", "i": self._pending.pop(str(move.src))})
+
+    def close(self, finished: bool = True):
+        if finished:
+            self._write({"op": "end"})
+        self.sync()
+        self._file.close()
+
+
+def journaled(moves, journal: Journal):
+    batch = []
+    for move in moves:
+        batch.append(move)
+        if len(batch) == JOURNAL_BATCH:
+            yield from journal.plan(batch)
+            batch = []
+    if batch:
+        yield from journal.plan(batch)
+
+
+def load_journal(folder: Path) -> dict:
+    """Runs recorded in the folder's journal, oldest first."""
+    runs = {}
+    path = folder / JOURNAL_FILE
+    if not path.exists():
+        return runs
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn final line from a crash
+            run = runs.setdefault(record["run"], {
+                "mode": None, "plan": {}, "done": set(), "ended": False, "undone": False,
+            })
+            op = record["op"]
+            if op == "begin":
+                run["mode"] = record["mode"]
+            elif op == "plan":
+                run["plan"][record["i"]] = (record["src"], record["dest"])
+            elif op == "done":
+                run["done"].add(record["i"])
+            elif op == "end":
+                run["ended"] = True
+            elif op == "undone":
+                run["undone"] = True
+    return runs
+
+
+def _move_file(src: str, dest: str, copies: ThreadPoolExecutor):
+    # Same-device moves are a single rename; only cross-device moves fall back
+    # to a full copy, and those run on a smaller pool so they cannot saturate
+    # the disks.
+    try:
+        os.replace(src, dest)
+        return None
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+    return copies.submit(shutil.move, src, dest)
+
+
+def execute_moves_parallel(folder: Path, moves, workers: int, journal: Journal | None = None) -> int:
+    created = set()
+    moved = 0
+    pending = deque()
+
+    def report(move, future):
+        nonlocal moved
+        try:
+            copy = future.result()
+            if copy is not None:
+                copy.result()
+        except OSError as e:
+            print(f"  FAILED: {move.name} → {move.dest_dir}/ — {e}")
+            return
+        if journal is not None:
+            journal.done(move)
+        print(f"  Moved: {move.name} → {move.dest_dir}/")
         moved += 1
+
+    # Results are reported in plan order; at most workers * QUEUED_PER_WORKER moves are queued.
+    with ThreadPoolExecutor(max_workers=workers) as renames, ThreadPoolExecutor(max_workers=COPY_WORKERS) as copies:
+        for move in moves:
+            if move.dest_dir not in created:
+                (folder / move.dest_dir).mkdir(parents=True, exist_ok=True)
+                created.add(move.dest_dir)
+            dest = folder / move.dest_dir / move.name
+            pending.append((move, renames.submit(_move_file, str(move.src), str(dest), copies)))
+            while len(pending) >= workers * QUEUED_PER_WORKER:
+                report(*pending.popleft())
+        while pending:
+            report(*pending.popleft())
     return moved
 
 
-def organize_by_date(folder: Path, dry_run: bool) -> int:
+def execute_moves(folder: Path, moves: list[PlannedMove], dry_run: bool, workers: int = 1,
+                  journal: Journal | None = None) -> int:
+    if workers > 1 and not dry_run:
+        return execute_moves_parallel(folder, moves, workers, journal)
+    created = set()
     moved = 0
-    for item in folder.iterdir():
-        if item.is_dir():
-            continue
-        date_path = get_file_date(item)
-        dest_dir = folder / date_path
-        dest = dest_dir / item.name
+    for move in moves:
         if dry_run:
-            print(f"  [DRY RUN] {item.name} → {date_path}/")
+            print(f"  [DRY RUN] {move.name} → {move.dest_dir}/")
         else:
-            dest_dir.mkdir(parents=True, exist_ok=True)
-            shutil.move(str(item), str(dest))
-            print(f"  Moved: {item.name} → {date_path}/")
+            dest_dir = folder / move.dest_dir
+            if move.dest_dir not in created:
+                dest_dir.mkdir(parents=True, exist_ok=True)
+                created.add(move.dest_dir)
+            shutil.move(str(move.src), str(dest_dir / move.name))
+            if journal is not None:
+                journal.done(move)
+            print(f"  Moved: {move.name} → {move.dest_dir}/")
         moved += 1
     return moved
 
 
-def organize_by_both(folder: Path, dry_run: bool) -> int:
-    moved = 0
-    for item in folder.iterdir():
-        if item.is_dir():
+def hash_file(path: str, limit: int | None = None) -> str | None:
+    h = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            if limit is not None:
+                h.update(f.read(limit))
+            else:
+                while block := f.read(HASH_BLOCK):
+                    h.update(block)
+    except OSError:
+        return None  # unreadable files are never reported as duplicates
+    return h.hexdigest()
+
+
+class HashCache:
+    def __init__(self, path: Path = HASH_CACHE):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(path))
+        self.read_only = False
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS hashes (
+                dev INTEGER, ino INTEGER, size INTEGER, mtime_ns INTEGER,
+                partial TEXT, full TEXT,
+                PRIMARY KEY (dev, ino)
+            )
+        """)
+
+    def get(self, st: os.stat_result, kind: str) -> str | None:
+        row = self.conn.execute(
+            f"SELECT {kind} FROM hashes WHERE dev = ? AND ino = ? AND size = ? AND mtime_ns = ?",
+            (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns),
+        ).fetchone()
+        return row[0] if row else None
+
+    def put(self, st: os.stat_result, kind: str, digest: str):
+        if self.read_only:
+            return
+        key = (st.st_dev, st.st_ino)
+        try:
+            updated = self.conn.execute(
+                f"UPDATE hashes SET {kind} = ? WHERE dev = ? AND ino = ? AND size = ? AND mtime_ns = ?",
+                (digest, *key, st.st_size, st.st_mtime_ns),
+            ).rowcount
+            if not updated:
+                self.conn.execute(
+                    f"INSERT OR REPLACE INTO hashes (dev, ino, size, mtime_ns, {kind}) VALUES (?, ?, ?, ?, ?)",
+                    (*key, st.st_size, st.st_mtime_ns, digest),
+                )
+        except sqlite3.Error:
+            self.read_only = True  # e.g. a cache file we may read but not write
+
+    def close(self):
+        try:
+            self.conn.commit()
+        except sqlite3.Error:
+            pass
+        self.conn.close()
+
+
+def digest_files(files: list[tuple[str, os.stat_result]], kind: str, workers: int,
+                 cache: HashCache | None) -> dict[str, str]:
+    digests = {}
+    todo = []
+    for path, st in files:
+        digest = cache.get(st, kind) if cache else None
+        if digest:
+            digests[path] = digest
+        else:
+            todo.append((path, st))
+    limit = PARTIAL_BYTES if kind == "partial" else None
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        for (path, st), digest in zip(todo, pool.map(lambda item: hash_file(item[0], limit), todo)):
+            if digest is None:
+                continue
+            digests[path] = digest
+            if cache:
+                cache.put(st, kind, digest)
+    return digests
+
+
+def group_duplicates(files: list[tuple[str, os.stat_result]], workers: int = 1,
+                     cache: HashCache | None = None) -> list[list[str]]:
+    """Groups of identical files (in input order), found by size, then first block, then full hash."""
+    by_size = {}
+    for path, st in files:
+        if st.st_size:
+            by_size.setdefault(st.st_size, []).append((path, st))
+    candidates = [item for group in by_size.values() if len(group) > 1 for item in group]
+
+    partial = digest_files(candidates, "partial", workers, cache)
+    by_partial = {}
+    for path, st in candidates:
+        if path in partial:
+            by_partial.setdefault((st.st_size, partial[path]), []).append((path, st))
+
+    groups = []
+    large = []
+    for (size, _), group in by_partial.items():
+        if len(group) < 2:
+            continue
+        if size <= PARTIAL_BYTES:
+            groups.append([path for path, _ in group])  # the first block was the whole file
+        else:
+            large.extend(group)
+
+    full = digest_files(large, "full", workers, cache)
+    by_full = {}
+    for path, st in large:
+        if path in full:
+            by_full.setdefault(full[path], []).append(path)
+    groups.extend(group for group in by_full.values() if len(group) > 1)
+
+    order = {path: i for i, (path, _) in enumerate(files)}
+    return [sorted(group, key=order.get) for group in groups]
+
+
+def unique_name(name: str, taken: set[str], dest_dir: str) -> str:
+    if f"{dest_dir}/{name}" not in taken:
+        return name
+    stem, ext = os.path.splitext(name)
+    n = 1
+    while f"{dest_dir}/{stem} ({n}){ext}" in taken:
+        n += 1
+    return f"{stem} ({n}){ext}"
+
+
+def dedup_moves(folder: Path, moves: list[PlannedMove], policy: str,
+                workers: int = 1) -> tuple[list[PlannedMove], list[tuple[str, str]]]:
+    """Compare the planned files with each other and with what is already in
+    their destination folders.
+
+    Returns the moves to make, renamed where the destination name is taken,
+    and (duplicate, original) pairs of destination paths to hard-link
+    afterwards when the policy is "hardlink".
+    """
+    existing = []
+    taken = set()
+    for dest_dir in dict.fromkeys(move.dest_dir for move in moves):
+        try:
+            with os.scandir(folder / dest_dir) as it:
+                for entry in it:
+                    if not entry.is_dir():
+                        taken.add(f"{dest_dir}/{entry.name}")
+                        existing.append((entry.path, entry.stat()))
+        except FileNotFoundError:
+            continue
+
+    # Files already in place come first, so they are kept over newcomers.
+    files = existing + [(str(move.src), move.st or move.src.stat()) for move in moves]
+    try:
+        cache = HashCache()
+    except (OSError, sqlite3.Error):
+        cache = None  # no writable cache dir: hash everything, as on a first run
+    try:
+        groups = group_duplicates(files, workers, cache)
+    finally:
+        if cache is not None:
+            cache.close()
+    original_of = {}
+    for group in groups:
+        for path in group[1:]:
+            original_of[path] = group[0]
+
+    kept = []
+    dest_of = {path: os.path.relpath(path, folder) for path, _ in existing}
+    links = []
+    for move in moves:
+        src = str(move.src)
+        original = original_of.get(src)
+        if original is not None and policy == "skip":
+            print(f"  Skipped duplicate: {move.name} (same as {dest_of[original]})")
+            continue
+        name = unique_name(move.name, taken, move.dest_dir)
+        dest = f"{move.dest_dir}/{name}"
+        taken.add(dest)
+        dest_of[src] = dest
+        kept.append(move._replace(name=name) if name != move.name else move)
+        if original is None:
+            continue
+        if policy == "hardlink":
+            links.append((dest, dest_of[original]))
+        else:
+            print(f"  Duplicate: {move.name} is the same as {dest_of[original]}")
+    return kept, links
+
+
+def link_duplicates(folder: Path, links: list[tuple[str, str]], dry_run: bool) -> int:
+    linked = 0
+    for dest, original in links:
+        if dry_run:
+            print(f"  [DRY RUN] {dest} ⇒ hard link to {original}")
+            linked += 1
+            continue
+        path = folder / dest
+        tmp = path.with_name(path.name + ".link-tmp")
+        try:
+            os.link(folder / original, tmp)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"  Could not link {dest} to {original}: {e}")
+            continue
+        print(f"  Linked: {dest} ⇒ {original}")
+        linked += 1
+    return linked
+
+
+def run_moves(folder: Path, moves, mode: str, dry_run: bool, workers: int = 1,
+              journal: bool = False, dedup: str | None = None, summary: bool = False) -> int:
+    links = []
+    if dedup:
+        moves, links = dedup_moves(folder, list(moves), dedup, workers)
+    moves = iter(moves)
+    first = next(moves, None)
+    if first is None:
+        return 0
+    moves = itertools.chain([first], moves)
+    if dry_run and summary:
+        return summarize_moves(moves, mode)
+    log = Journal(folder, mode) if journal and not dry_run else None
+    try:
+        count = execute_moves(folder, journaled(moves, log) if log else moves, dry_run, workers, log)
+    except BaseException:
+        if log is not None:
+            log.close(finished=False)
+        raise
+    if log is not None:
+        log.close()
+    if links:
+        linked = link_duplicates(folder, links, dry_run)
+        print(f"  {linked} duplicate(s) {'would be' if dry_run else 'were'} replaced by hard links.")
+    return count
+
+
+def organize(folder: Path, mode: str, dry_run: bool, timings: dict | None = None,
+             rules: RuleSet | None = None, workers: int = 1, journal: bool = False,
+             dedup: str | None = None, recursive: bool = False, summary: bool = False,
+             plan_file: Path | None = None) -> int:
+    need_stat = summary or bool(dedup) or mode != "type" or (rules is not None and rules.needs_stat)
+    started = time.perf_counter()
+    if recursive:
+        # Scanning, planning and moving are streamed together, so memory stays
+        # flat however large the tree is; their time is all reported as "move".
+        entries = iter_files(folder, need_stat, True, organized_folders(mode, rules))
+        moves = avoid_collisions(folder, iter_moves(entries, mode, rules), collision_window(workers))
+    else:
+        entries = scan_folder(folder, need_stat)
+    scanned = time.perf_counter()
+    if not recursive:
+        moves = plan_moves(entries, mode, rules)
+    planned = time.perf_counter()
+    if plan_file is not None:
+        moves = write_plan(moves, plan_file, folder)
+    count = run_moves(folder, moves, mode, dry_run, workers, journal, dedup, summary)
+    if timings is not None:
+        timings.update(scan=scanned - started, plan=planned - scanned, move=time.perf_counter() - planned)
+    return count
+
+
+def resume_run(folder: Path, run_id: str, run: dict, workers: int = 1) -> int:
+    """Finish an interrupted run from its journal, without rescanning the folder."""
+    log = Journal(folder, run["mode"], run_id)
+    moves = []
+    for i, (src, dest) in sorted(run["plan"].items()):
+        src_path = folder / src
+        # A move whose "done" record was lost in the crash already happened if its source is gone.
+        if i in run["done"] or not src_path.exists():
+            continue
+        dest_dir, _, name = dest.rpartition("/")
+        move = PlannedMove(name, src_path, dest_dir, None)
+        log.track(move, i)
+        moves.append(move)
+    try:
+        count = execute_moves(folder, moves, False, workers, log)
+    except BaseException:
+        log.close(finished=False)
+        raise
+    log.close()
+    return count
+
+
+def undo_run(folder: Path, run_id: str, run: dict, dry_run: bool) -> int:
+    """Move every file of a journaled run back where it came from."""
+    restored = 0
+    dest_dirs = set()
+    for i in sorted(run["plan"], reverse=True):
+        src, dest = run["plan"][i]
+        src_path, dest_path = folder / src, folder / dest
+        # Moves whose "done" record was lost in a crash are recognized by where the file is now.
+        if not dest_path.exists() or src_path.exists():
             continue
-        category = get_file_type(item.suffix)
-        date_path = get_file_date(item)
-        dest_dir = folder / category / date_path
-        dest = dest_dir / item.name
         if dry_run:
-            print(f"  [DRY RUN] {item.name} → {category}/{date_path}/")
+            print(f"  [DRY RUN] {dest} → {src}")
         else:
-            dest_dir.mkdir(parents=True, exist_ok=True)
-            shutil.move(str(item), str(dest))
-            print(f"  Moved: {item.name} → {category}/{date_path}/")
-        moved += 1
+            src_path.parent.mkdir(parents=True, exist_ok=True)
+            shutil.move(str(dest_path), str(src_path))
+            print(f"  Restored: {dest} → {src}")
+        dest_dirs.add(dest_path.parent)
+        restored += 1
+    if dry_run:
+        return restored
+
+    # Remove destination folders the run created and left empty, deepest first.
+    candidates = set()
+    for d in dest_dirs:
+        while d != folder and folder in d.parents:
+            candidates.add(d)
+            d = d.parent
+    for d in sorted(candidates, key=lambda p: len(p.parts), reverse=True):
+        try:
+            d.rmdir()
+        except OSError:
+            pass
+    with open_journal(folder) as f:
+        f.write(json.dumps({"run": run_id, "op": "undone"}) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    return restored
+
+
+class Arrival(NamedTuple):
+    # Stands in for the os.DirEntry that scan_folder would have produced.
+    name: str
+    path: str
+
+
+class Inotify:
+    """Events for one directory through the Linux inotify API (via ctypes)."""
+
+    def __init__(self, folder: Path):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        mask = IN_CREATE | IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO
+        if libc.inotify_add_watch(self.fd, os.fsencode(folder), mask) < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, os.strerror(err))
+
+    def read(self, timeout: float | None) -> list[str] | None:
+        """Names of files touched, waiting up to timeout seconds (forever if None).
+
+        Returns None if the kernel dropped events, in which case the caller
+        has to look at the whole folder again.
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        names = []
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                return None
+            if name and not mask & IN_ISDIR:
+                names.append(name)
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class Poller:
+    """Fallback watcher: compares directory listings every interval seconds."""
+
+    def __init__(self, folder: Path, interval: float):
+        self.folder = folder
+        self.interval = interval
+        self.seen = self._snapshot()
+
+    def _snapshot(self) -> dict[str, tuple[int, int]]:
+        snapshot = {}
+        with os.scandir(self.folder) as it:
+            for entry in it:
+                if not entry.is_dir():
+                    st = entry.stat()
+                    snapshot[entry.name] = (st.st_size, st.st_mtime_ns)
+        return snapshot
+
+    def read(self, timeout: float | None) -> list[str]:
+        time.sleep(self.interval if timeout is None else min(max(timeout, 0.05), self.interval))
+        snapshot = self._snapshot()
+        changed = [name for name, sig in snapshot.items() if self.seen.get(name) != sig]
+        self.seen = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+
+def organize_arrivals(folder: Path, names: list[str], mode: str, rules: RuleSet | None,
+                      workers: int = 1, journal: bool = False, dedup: str | None = None) -> tuple[int, list[str]]:
+    """Move just the named files. Returns the count and the names still being written."""
+    entries = []
+    busy = []
+    now = time.time()
+    for name in sorted(names):
+        path = folder / name
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            continue  # renamed, deleted or already organized
+        if not stat.S_ISREG(st.st_mode):
+            continue
+        if now - st.st_mtime < WATCH_SETTLE:
+            busy.append(name)
+            continue
+        entries.append((Arrival(name, str(path)), st))
+    if not entries:
+        return 0, busy
+    print(f"[{datetime.now():%H:%M:%S}] {len(entries)} new file(s)")
+    return run_moves(folder, plan_moves(entries, mode, rules), mode, False, workers, journal, dedup), busy
+
+
+def watch(folder: Path, mode: str, rules: RuleSet | None = None, workers: int = 1,
+          journal: bool = False, poll_interval: float | None = None, dedup: str | None = None) -> int:
+    watcher = None
+    if poll_interval is None and sys.platform.startswith("linux"):
+        try:
+            watcher = Inotify(folder)
+        except (OSError, AttributeError) as e:
+            print(f"inotify is unavailable ({e}); polling every {WATCH_POLL:g}s instead.")
+    if watcher is None:
+        watcher = Poller(folder, poll_interval or WATCH_POLL)
+
+    # The watcher is started first so nothing that lands during this pass is missed.
+    moved = organize(folder, mode, False, rules=rules, workers=workers, journal=journal, dedup=dedup)
+    pending = {}  # name -> monotonic time of its latest event
+    try:
+        while True:
+            timeout = None
+            if pending:
+                timeout = max(0.0, min(pending.values()) + WATCH_SETTLE - time.monotonic())
+            names = watcher.read(timeout)
+            now = time.monotonic()
+            if names is None:
+                print("Too many events at once; rescanning the folder.")
+                pending.clear()
+                moved += organize(folder, mode, False, rules=rules, workers=workers, journal=journal, dedup=dedup)
+                continue
+            for name in names:
+                if name != JOURNAL_FILE and not name.endswith(PARTIAL_SUFFIXES):
+                    pending[name] = now
+            settled = [name for name, seen in pending.items() if now - seen >= WATCH_SETTLE]
+            if not settled:
+                continue
+            for name in settled:
+                del pending[name]
+            count, busy = organize_arrivals(folder, settled, mode, rules, workers, journal, dedup)
+            moved += count
+            for name in busy:
+                pending[name] = now
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
     return moved
 
 
+def organize_by_type(folder: Path, dry_run: bool) -> int:
+    return organize(folder, "type", dry_run)
+
+
+def organize_by_date(folder: Path, dry_run: bool) -> int:
+    return organize(folder, "date", dry_run)
+
+
+def organize_by_both(folder: Path, dry_run: bool) -> int:
+    return organize(folder, "both", dry_run)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Automatically organize files in a folder."
@@ -113,6 +1081,69 @@ def main():
         action="store_true",
         help="Preview changes without moving any files",
     )
+    parser.add_argument(
+        "--rules",
+        help="JSON rules file for custom categories (glob, regex, extensions, size, mime)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Move files concurrently with this many threads (default: 1)",
+    )
+    parser.add_argument(
+        "--recursive",
+        action="store_true",
+        help="Also organize files in subfolders (folders this tool created are left alone)",
+    )
+    parser.add_argument(
+        "--summary",
+        action="store_true",
+        help="With --dry-run, print file counts and sizes per category and month instead of "
+             "one line per file (the default with --recursive)",
+    )
+    parser.add_argument(
+        "--plan-file",
+        help="Write every planned move to this JSONL file",
+    )
+    parser.add_argument(
+        "--dedup",
+        choices=["skip", "hardlink", "report"],
+        help="Find files identical to another file being organized or already in its destination: "
+             "leave them where they are (skip), replace them with hard links, or just list them. "
+             "Duplicates are found across the whole scan, so the planned moves are held in memory",
+    )
+    parser.add_argument(
+        "--undo",
+        action="store_true",
+        help="Move the files from the last run back to where they were",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Finish an interrupted run from the journal",
+    )
+    parser.add_argument(
+        "--no-journal",
+        action="store_true",
+        help=f"Do not record this run in {JOURNAL_FILE} (it cannot be undone)",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and organize new files as they arrive (Ctrl+C to stop)",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        help=f"With --watch, check for new files every N seconds instead of using inotify "
+             f"(the default outside Linux, every {WATCH_POLL:g}s)",
+    )
+    parser.add_argument(
+        "--timing",
+        action="store_true",
+        help="Show how long scanning, planning and moving took",
+    )
     args = parser.parse_args()
 
     folder = Path(args.folder).expanduser().resolve()
@@ -120,19 +1151,77 @@ def main():
         print(f"Error: '{folder}' is not a valid directory.")
         return
 
+    rules = None
+    if args.rules:
+        try:
+            rules = load_rules(args.rules)
+        except ValueError as e:
+            print(f"Error: invalid rules file '{args.rules}' — {e}")
+            return
+
+    runs = load_journal(folder)
+    interrupted = [(run_id, run) for run_id, run in runs.items() if not run["ended"] and not run["undone"]]
+
+    if args.undo:
+        candidates = [(run_id, run) for run_id, run in runs.items() if not run["undone"] and run["plan"]]
+        if not candidates:
+            print("Nothing to undo: every recorded run in this folder has already been undone.")
+            return
+        run_id, run = candidates[-1]
+        print(f"\nUndoing run {run_id} (mode: {run['mode']}) in: {folder} {'(DRY RUN)' if args.dry_run else ''}")
+        print("-" * 50)
+        count = undo_run(folder, run_id, run, args.dry_run)
+        print("-" * 50)
+        print(f"Done. {count} file(s) {'would be' if args.dry_run else 'were'} restored.\n")
+        return
+
+    if args.resume:
+        if not interrupted:
+            print("Nothing to resume: the last run finished.")
+            return
+        run_id, run = interrupted[-1]
+        print(f"\nResuming run {run_id} (mode: {run['mode']}) in: {folder}")
+        print("-" * 50)
+        count = resume_run(folder, run_id, run, args.workers)
+        print("-" * 50)
+        print(f"Done. {count} more file(s) were moved.\n")
+        return
+
+    if interrupted and not args.dry_run:
+        print(f"A previous run ({interrupted[-1][0]}) was interrupted.")
+        print("Run again with --resume to finish it, or --undo to roll it back.")
+        return
+
+    if args.watch:
+        if args.dry_run:
+            print("Error: --watch moves files as they arrive and cannot be combined with --dry-run.")
+            return
+        print(f"\nWatching: {folder}")
+        print(f"Mode: {args.mode} (Ctrl+C to stop)")
+        print("-" * 50)
+        count = watch(folder, args.mode, rules, args.workers, not args.no_journal, args.poll_interval, args.dedup)
+        print("-" * 50)
+        print(f"Stopped watching. {count} file(s) were moved.\n")
+        return
+
     print(f"\nOrganizing: {folder}")
     print(f"Mode: {args.mode} {'(DRY RUN)' if args.dry_run else ''}")
     print("-" * 50)
 
-    if args.mode == "type":
-        count = organize_by_type(folder, args.dry_run)
-    elif args.mode == "date":
-        count = organize_by_date(folder, args.dry_run)
-    else:
-        count = organize_by_both(folder, args.dry_run)
+    timings = {}
+    count = organize(folder, args.mode, args.dry_run, timings, rules, args.workers,
+                     journal=not args.no_journal, dedup=args.dedup, recursive=args.recursive,
+                     summary=args.summary or args.recursive,
+                     plan_file=Path(args.plan_file).expanduser() if args.plan_file else None)
 
     print("-" * 50)
-    print(f"Done. {count} file(s) {'would be' if args.dry_run else 'were'} moved.\n")
+    print(f"Done. {count} file(s) {'would be' if args.dry_run else 'were'} moved.")
+    if args.timing:
+        print(f"Timing: scan {timings['scan']:.3f}s | plan {timings['plan']:.3f}s | "
+              f"{'preview' if args.dry_run else 'move'} {timings['move']:.3f}s")
+    if not args.dry_run and not args.no_journal and count:
+        print("Changed your mind? Run again with --undo to put everything back.")
+    print()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,403 @@
+"""
+pdf_benchmark.py — Measure pdf_extractor.py speed on a reproducible synthetic corpus.
+
+Usage:
+    # Generate a synthetic corpus only (same seed → same PDFs)
+    python pdf_benchmark.py generate bench-corpus --files 40 --seed 7
+
+    # Run the full benchmark and save results
+    python pdf_benchmark.py run --output results.json
+
+    # Compare against an earlier run; exits with status 1 on a regression
+    python pdf_benchmark.py run --output new.json --compare results.json --threshold 10
+
+    # Compare two saved result files without running anything
+    python pdf_benchmark.py compare results.json new.json
+
+Requirements:
+    pip install pymupdf
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from datetime import datetime
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    print("Missing dependency. Please run: pip install pymupdf")
+    exit(1)
+
+try:
+    import resource
+except ImportError:
+    resource = None  # not available on Windows; peak RSS is reported as null
+
+EXTRACTOR = Path(__file__).with_name("pdf_extractor.py")
+
+# (share of files, page range, lines per page range)
+CORPUS_PROFILES = {
+    "small":  (0.70, (1, 5), (5, 15)),
+    "medium": (0.25, (20, 60), (20, 40)),
+    "large":  (0.05, (300, 600), (40, 60)),
+}
+
+WORDS = (
+    "revenue profit growth market quarter sales cost margin forecast budget customer "
+    "product region contract invoice payment policy report annual total net gross "
+    "operating expense asset liability equity cash flow risk audit compliance summary"
+).split()
+
+SEARCH_TERMS = ["revenue", "net profit", "zzzz-not-present"]
+
+
+def generate_corpus(folder: Path, files: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    folder.mkdir(parents=True, exist_ok=True)
+    names = list(CORPUS_PROFILES)
+    weights = [CORPUS_PROFILES[n][0] for n in names]
+    stats = {"files": 0, "pages": 0, "bytes": 0, "profiles": {n: 0 for n in names}}
+    for i in range(files):
+        # Guarantee every profile appears at least once in non-trivial corpora.
+        profile = names[i] if i < len(names) and files >= len(names) else rng.choices(names, weights)[0]
+        _, page_range, line_range = CORPUS_PROFILES[profile]
+        doc = fitz.open()
+        pages = rng.randint(*page_range)
+        for p in range(pages):
+            page = doc.new_page()
+            lines = [f"{profile} document {i} page {p + 1}"]
+            for _ in range(rng.randint(*line_range)):
+                lines.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 12))))
+            page.insert_text((50, 50), "\n".join(lines), fontsize=8)
+        doc.set_metadata({"title": f"Synthetic {profile} {i}", "author": "pdf_benchmark"})
+        path = folder / f"{profile}-{i:04d}.pdf"
+        doc.save(str(path))
+        doc.close()
+        stats["files"] += 1
+        stats["pages"] += pages
+        stats["bytes"] += path.stat().st_size
+        stats["profiles"][profile] += 1
+    return stats
+
+
+def percentiles(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+
+    def pct(q):
+        k = (len(ordered) - 1) * q
+        lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+        return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+    return {
+        "runs": len(ordered),
+        "min": ordered[0],
+        "p50": pct(0.50),
+        "p90": pct(0.90),
+        "p99": pct(0.99),
+        "max": ordered[-1],
+        "mean": sum(ordered) / len(ordered),
+    }
+
+
+def peak_rss_mb(who) -> float | None:
+    if resource is None:
+        return None
+    rss = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def bench_stages(pdfs: list[Path], repeat: int) -> dict:
+    sys.path.insert(0, str(EXTRACTOR.parent))
+    import pdf_extractor as px
+
+    px.configure_cache(None)
+    total_pages = sum(px.page_count(p) for p in pdfs)
+    samples = {name: [] for name in ("extract", "format_text", "format_markdown", "keyword_scan",
+                                     "query_scan", "index_build", "index_search")}
+    for _ in range(repeat):
+        started = time.perf_counter()
+        extracted = [(p, px.extract_text_from_pdf(p)) for p in pdfs]
+        samples["extract"].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for _, pages in extracted:
+            px.format_as_text(pages)
+        samples["format_text"].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for p, pages in extracted:
+            px.format_as_markdown(pages, title=p.stem)
+        samples["format_markdown"].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for term in SEARCH_TERMS:
+            sum(term in page["text"].lower() for _, pages in extracted for page in pages)
+        samples["keyword_scan"].append(time.perf_counter() - started)
+
+        query = px.SearchQuery('revenue AND ("net profit" OR /cash\\s+flow/) NOT zzzz')
+        started = time.perf_counter()
+        for _, pages in extracted:
+            for page in pages:
+                query.score(page["text"])
+        samples["query_scan"].append(time.perf_counter() - started)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = px.open_index(Path(tmp) / "index.db")
+            started = time.perf_counter()
+            px.update_index(conn, pdfs)
+            samples["index_build"].append(time.perf_counter() - started)
+            for term in SEARCH_TERMS:
+                started = time.perf_counter()
+                list(px.search_index(conn, term))
+                samples["index_search"].append(time.perf_counter() - started)
+            conn.close()
+
+    stages = {}
+    for name, times in samples.items():
+        stages[name] = percentiles(times)
+        if name in ("extract", "format_text", "format_markdown", "keyword_scan", "query_scan", "index_build"):
+            stages[name]["pages_per_sec"] = total_pages / stages[name]["p50"] if stages[name]["p50"] else None
+    return stages
+
+
+def run_command(argv: list[str]) -> tuple[float, int, float | None]:
+    """Run pdf_extractor.py once; returns (seconds, exit code, child peak RSS in MB or None)."""
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, str(EXTRACTOR), *argv],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if hasattr(os, "wait4"):
+        _, status, usage = os.wait4(proc.pid, 0)
+        elapsed = time.perf_counter() - started
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        rss = usage.ru_maxrss / (1024 * 1024) if sys.platform == "darwin" else usage.ru_maxrss / 1024
+        return elapsed, proc.returncode, rss
+    proc.wait()
+    return time.perf_counter() - started, proc.returncode, None
+
+
+def bench_commands(corpus: Path, pdfs: list[Path], total_pages: int, repeat: int, workers: int) -> dict:
+    largest = max(pdfs, key=lambda p: p.stat().st_size)
+    work = Path(tempfile.mkdtemp(prefix="pdf_benchmark-"))
+    cache_dir = work / "cache"
+    index_file = work / "index.db"
+    # batch writes next to its input; run everything on a mirror so a corpus
+    # the user passed in is never written to or cleaned up.
+    mirror = work / "corpus"
+    mirror.mkdir()
+    for pdf in pdfs:
+        try:
+            (mirror / pdf.name).symlink_to(pdf.resolve())
+        except OSError:
+            shutil.copy2(pdf, mirror / pdf.name)
+    corpus = mirror
+    cold = ["--no-cache"]
+    warm = ["--cache-dir", str(cache_dir)]
+    commands = {
+        "extract": (["extract", str(largest), "--output", str(work / "out.txt")] + cold, None),
+        "extract_markdown": (["extract", str(largest), "--format", "markdown",
+                              "--output", str(work / "out.md")] + cold, None),
+        "batch": (["batch", str(corpus), "--force"] + cold, total_pages),
+        "batch_workers": (["batch", str(corpus), "--force", "--workers", str(workers)] + cold, total_pages),
+        "batch_pipeline": (["batch", str(corpus), "--force", "--pipeline"] + cold, total_pages),
+        "batch_warm_cache": (["batch", str(corpus), "--force"] + warm, total_pages),
+        "index": (["index", str(corpus), "--rebuild", "--index", str(index_file)] + cold, total_pages),
+        "search_indexed": (["search", str(corpus), "--keyword", "revenue", "--index", str(index_file)] + cold, None),
+        "search_scan": (["search", str(corpus), "--keyword", "revenue", "--no-index"] + cold, total_pages),
+        "info": (["info", str(largest)] + cold, None),
+    }
+    results = {}
+    try:
+        # Prime the warm cache and the search index once before timing.
+        run_command(["batch", str(corpus), "--force"] + warm)
+        for name, (argv, pages) in commands.items():
+            if name == "search_indexed":
+                run_command(["index", str(corpus), "--index", str(index_file)] + cold)
+            times = []
+            rss = []
+            failed = 0
+            for _ in range(repeat):
+                elapsed, code, peak = run_command(argv)
+                times.append(elapsed)
+                failed += code != 0
+                if peak is not None:
+                    rss.append(peak)
+            results[name] = percentiles(times)
+            results[name]["failed_runs"] = failed
+            results[name]["peak_rss_mb"] = max(rss) if rss else None
+            if pages:
+                results[name]["pages_per_sec"] = pages / results[name]["p50"]
+            peak = results[name]["peak_rss_mb"]
+            print(f"  {name:<18} p50 {results[name]['p50'] * 1000:9.1f} ms"
+                  + (f"   peak RSS {peak:6.1f} MB" if peak is not None else ""))
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    return results
+
+
+def compare_results(old: dict, new: dict, threshold: float) -> list[str]:
+    regressions = []
+    print(f"\n{'Metric':<40} {'Before':>12} {'After':>12} {'Change':>9}")
+    print("-" * 76)
+    for section in ("stages", "commands"):
+        for name, after in new.get(section, {}).items():
+            before = old.get(section, {}).get(name)
+            if not before:
+                continue
+            change = (after["p50"] - before["p50"]) / before["p50"] * 100 if before["p50"] else 0.0
+            flag = "  SLOWER" if change > threshold else ""
+            print(f"{section + '.' + name + ' p50 (ms)':<40} {before['p50'] * 1000:>12.1f} "
+                  f"{after['p50'] * 1000:>12.1f} {change:>+8.1f}%{flag}")
+            if flag:
+                regressions.append(f"{section}.{name}")
+    old_rss = old.get("peak_rss_mb", {}).get("commands")
+    new_rss = new.get("peak_rss_mb", {}).get("commands")
+    if old_rss and new_rss:
+        change = (new_rss - old_rss) / old_rss * 100
+        flag = "  LARGER" if change > threshold else ""
+        print(f"{'peak RSS, commands (MB)':<40} {old_rss:>12.1f} {new_rss:>12.1f} {change:>+8.1f}%{flag}")
+        if flag:
+            regressions.append("peak_rss_mb.commands")
+    return regressions
+
+
+def cmd_generate(args):
+    folder = Path(args.folder)
+    stats = generate_corpus(folder, args.files, args.seed)
+    print(f"Generated {stats['files']} PDF(s), {stats['pages']:,} page(s), "
+          f"{stats['bytes'] / 1024 / 1024:.1f} MB in: {folder}")
+
+
+def cmd_run(args):
+    if args.corpus:
+        corpus = Path(args.corpus)
+        temp_corpus = None
+    else:
+        temp_corpus = Path(tempfile.mkdtemp(prefix="pdf_benchmark-corpus-"))
+        corpus = temp_corpus
+        print(f"Generating corpus ({args.files} files, seed {args.seed})...")
+        generate_corpus(corpus, args.files, args.seed)
+
+    try:
+        pdfs = sorted(corpus.glob("*.pdf"))
+        if not pdfs:
+            print(f"Error: no PDF files found in '{corpus}'.")
+            return 2
+        total_pages = 0
+        for p in pdfs:
+            with fitz.open(str(p)) as doc:
+                total_pages += doc.page_count
+        total_bytes = sum(p.stat().st_size for p in pdfs)
+        print(f"Corpus: {len(pdfs)} file(s), {total_pages:,} page(s), {total_bytes / 1024 / 1024:.1f} MB\n")
+
+        # Commands run first so children are not measured against a parent
+        # already grown by the in-process stages.
+        print("Timing commands end-to-end...")
+        workers = args.workers or os.cpu_count() or 1
+        commands = bench_commands(corpus, pdfs, total_pages, args.repeat, workers)
+        rss = [c["peak_rss_mb"] for c in commands.values() if c["peak_rss_mb"] is not None]
+        commands_rss = max(rss) if rss else None
+
+        print("\nTiming stages in-process...")
+        stages = bench_stages(pdfs, args.repeat)
+        stages_rss = peak_rss_mb(resource.RUSAGE_SELF) if resource else None
+        for name, st in stages.items():
+            print(f"  {name:<18} p50 {st['p50'] * 1000:9.1f} ms")
+    finally:
+        if temp_corpus is not None:
+            shutil.rmtree(temp_corpus, ignore_errors=True)
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pymupdf": getattr(fitz, "VersionBind", None),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "corpus": {"files": len(pdfs), "pages": total_pages, "bytes": total_bytes},
+        },
+        "peak_rss_mb": {"stages": stages_rss, "commands": commands_rss},
+        "stages": stages,
+        "commands": commands,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"\nResults saved to: {args.output}")
+
+    if args.compare:
+        regressions = compare_results(json.loads(Path(args.compare).read_text(encoding="utf-8")),
+                                      results, args.threshold)
+        if regressions:
+            print(f"\nRegressions over {args.threshold}%: {', '.join(regressions)}")
+            return 1
+        print(f"\nNo regressions over {args.threshold}%.")
+    return 0
+
+
+def cmd_compare(args):
+    old = json.loads(Path(args.before).read_text(encoding="utf-8"))
+    new = json.loads(Path(args.after).read_text(encoding="utf-8"))
+    regressions = compare_results(old, new, args.threshold)
+    if regressions:
+        print(f"\nRegressions over {args.threshold}%: {', '.join(regressions)}")
+        return 1
+    print(f"\nNo regressions over {args.threshold}%.")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pdf_extractor.py on a synthetic PDF corpus.")
+    subparsers = parser.add_subparsers(dest="command")
+
+    # generate
+    p_gen = subparsers.add_parser("generate", help="Write a reproducible synthetic PDF corpus")
+    p_gen.add_argument("folder", help="Folder to write the PDFs into")
+    p_gen.add_argument("--files", type=int, default=40, help="Number of PDFs (default: 40)")
+    p_gen.add_argument("--seed", type=int, default=7, help="Random seed (default: 7)")
+
+    # run
+    p_run = subparsers.add_parser("run", help="Run the benchmark")
+    p_run.add_argument("--corpus", help="Existing corpus folder (default: generate a temporary one)")
+    p_run.add_argument("--files", type=int, default=40, help="Files in the generated corpus (default: 40)")
+    p_run.add_argument("--seed", type=int, default=7, help="Seed for the generated corpus (default: 7)")
+    p_run.add_argument("--repeat", type=int, default=5, help="Timed runs per stage and command (default: 5)")
+    p_run.add_argument("--workers", type=int, default=0, help="Workers for the batch_workers run (default: CPUs)")
+    p_run.add_argument("--output", help="Save results to this JSON file")
+    p_run.add_argument("--compare", help="Earlier results JSON to compare against")
+    p_run.add_argument("--threshold", type=float, default=10.0,
+                       help="Percent slowdown counted as a regression (default: 10)")
+
+    # compare
+    p_cmp = subparsers.add_parser("compare", help="Compare two saved result files")
+    p_cmp.add_argument("before", help="Baseline results JSON")
+    p_cmp.add_argument("after", help="New results JSON")
+    p_cmp.add_argument("--threshold", type=float, default=10.0,
+                       help="Percent slowdown counted as a regression (default: 10)")
+
+    args = parser.parse_args()
+
+    commands = {
+        "generate": cmd_generate,
+        "run": cmd_run,
+        "compare": cmd_compare,
+    }
+
+    if args.command in commands:
+        sys.exit(commands[args.command](args) or 0)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
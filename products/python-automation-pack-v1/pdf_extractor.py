@@ -11,21 +11,57 @@ Usage:
     # Extract specific pages only
     python pdf_extractor.py extract report.pdf --pages 1-5
 
+    # One JSON record per page (file, page, chars, text); --format parquet needs pyarrow
+    python pdf_extractor.py extract report.pdf --format jsonl
+
     # Batch extract all PDFs in a folder
     python pdf_extractor.py batch /path/to/folder
 
-    # Search for keyword across all PDFs in a folder
+    # Batch extract using 8 worker processes
+    python pdf_extractor.py batch /path/to/folder --workers 8
+
+    # Batch extract a nested folder tree; re-runs only pick up new, changed or failed PDFs
+    python pdf_extractor.py batch /path/to/folder --recursive
+
+    # Overlap reads, extraction and writes (helps most on network storage)
+    python pdf_extractor.py batch /path/to/folder --pipeline --io-threads 8
+
+    # Build or refresh the search index for a folder
+    python pdf_extractor.py index /path/to/folder
+
+    # Search for keyword across all PDFs in a folder (uses the index)
     python pdf_extractor.py search /path/to/folder --keyword "revenue"
 
-    # Get basic info (page count, metadata)
+    # Boolean query with phrases and regexes, ranked by hits
+    python pdf_extractor.py search /path/to/folder --query '"net profit" AND (q3 OR q4) NOT /draft\s+\d+/' --max-results 50
+
+    # Get basic info (page count, metadata, outline, text layer)
     python pdf_extractor.py info report.pdf
 
+    # Summarize a whole folder as a table or JSON; --chars adds full character counts
+    python pdf_extractor.py info /path/to/folder --recursive --json
+
+    # Every command reads through an extraction cache (~/.cache/pdf_extractor);
+    # bypass it or move it with:
+    python pdf_extractor.py batch /path/to/folder --no-cache
+    python pdf_extractor.py batch /path/to/folder --cache-dir /fast/disk/cache --cache-size-mb 4096
+
 Requirements:
     pip install pymupdf
+    pip install pyarrow  # optional, for --format parquet
 """
 
 import argparse
+import hashlib
+import json
+import os
+import queue
 import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
 
@@ -35,6 +71,43 @@ except ImportError:
     print("Missing dependency. Please run: pip install pymupdf")
     exit(1)
 
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None  # only needed for --format parquet
+
+# Documents longer than this are split into page ranges across workers.
+CHUNK_PAGES = 200
+
+INDEX_FILE = ".pdf_index.db"
+TOKEN_RE = re.compile(r"\w+")
+
+CACHE_DIR = Path.home() / ".cache" / "pdf_extractor"
+CACHE_SIZE_MB = 1024
+EXTRACT_MODE = "text"
+
+# Pages fetched from the cache or the PDF per round trip when streaming.
+STREAM_BLOCK = 64
+
+FORMAT_EXTENSIONS = {"text": ".txt", "markdown": ".md", "jsonl": ".jsonl", "parquet": ".parquet"}
+
+# Pages buffered per Parquet row group.
+PARQUET_ROW_GROUP = 1000
+
+MANIFEST_FILE = "manifest.jsonl"
+
+# Pages checked for a text layer by `info`.
+INFO_SAMPLE_PAGES = 5
+
+# Pipeline mode: concurrent file readers and files read ahead of the writer.
+IO_THREADS = 4
+PREFETCH = 8
+
+# Extraction cache settings for this process; see configure_cache().
+_cache_settings = {"dir": CACHE_DIR, "max_bytes": CACHE_SIZE_MB * 1024 * 1024, "generation": 0}
+_cache_local = threading.local()
+
 
 def parse_page_range(page_str: str, total_pages: int) -> list[int]:
     pages = set()
@@ -48,40 +121,265 @@ def parse_page_range(page_str: str, total_pages: int) -> list[int]:
     return sorted(pages)
 
 
+def configure_cache(cache_dir: Path | None, max_bytes: int = CACHE_SIZE_MB * 1024 * 1024):
+    _cache_settings["dir"] = cache_dir
+    _cache_settings["max_bytes"] = max_bytes
+    _cache_settings["generation"] += 1
+
+
+def get_cache() -> sqlite3.Connection | None:
+    if _cache_settings["dir"] is None:
+        return None
+    # SQLite connections must not cross a fork or a thread, so each worker
+    # process and pipeline thread opens its own.
+    key = (os.getpid(), _cache_settings["generation"])
+    if getattr(_cache_local, "key", None) != key:
+        try:
+            cache_dir = Path(_cache_settings["dir"])
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(cache_dir / "cache.db"), timeout=60)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS fingerprints (
+                    path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, digest TEXT
+                );
+                CREATE TABLE IF NOT EXISTS documents (digest TEXT PRIMARY KEY, pages INTEGER);
+                CREATE TABLE IF NOT EXISTS pages (
+                    digest TEXT, mode TEXT, page INTEGER, text TEXT, size INTEGER, last_used REAL,
+                    PRIMARY KEY (digest, mode, page)
+                );
+                CREATE INDEX IF NOT EXISTS pages_lru ON pages(last_used);
+                CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER);
+                INSERT OR IGNORE INTO meta VALUES ('total_bytes', 0);
+            """)
+        except (OSError, sqlite3.Error):
+            # The cache only saves time; without a writable cache dir, extract directly.
+            conn = None
+        _cache_local.conn, _cache_local.key = conn, key
+    return _cache_local.conn
+
+
+def open_pdf(pdf_path: Path, data: bytes | None = None):
+    if data is not None:
+        return fitz.open(stream=data, filetype="pdf")
+    return fitz.open(str(pdf_path))
+
+
+def sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def file_digest(cache: sqlite3.Connection, pdf_path: Path, data: bytes | None = None) -> str:
+    """Content hash of `pdf_path`, recomputed only when its size or mtime changes."""
+    st = pdf_path.stat()
+    key = str(pdf_path.resolve())
+    row = cache.execute("SELECT size, mtime_ns, digest FROM fingerprints WHERE path = ?", (key,)).fetchone()
+    if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+        return row[2]
+    digest = hashlib.sha256(data).hexdigest() if data is not None else sha256_file(pdf_path)
+    with cache:
+        cache.execute("INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?, ?)",
+                      (key, st.st_size, st.st_mtime_ns, digest))
+    return digest
+
+
+def _evict_cache(cache: sqlite3.Connection):
+    total = cache.execute("SELECT value FROM meta WHERE key = 'total_bytes'").fetchone()[0]
+    excess = total - _cache_settings["max_bytes"]
+    if excess <= 0:
+        return
+    freed = 0
+    victims = []
+    for digest, mode, page, size in cache.execute(
+        "SELECT digest, mode, page, size FROM pages ORDER BY last_used"
+    ):
+        victims.append((digest, mode, page))
+        freed += size
+        if freed >= excess:
+            break
+    cache.executemany("DELETE FROM pages WHERE digest = ? AND mode = ? AND page = ?", victims)
+    cache.execute("UPDATE meta SET value = value - ? WHERE key = 'total_bytes'", (freed,))
+
+
+def _cached_blocks(wanted, size: int):
+    block = []
+    for i in wanted:
+        block.append(i)
+        if len(block) == size:
+            yield block
+            block = []
+    if block:
+        yield block
+
+
+def iter_raw_pages(pdf_path: Path, page_indices=None, data: bytes | None = None):
+    """Yield raw page text for `page_indices` (all pages if None), served from the cache when possible.
+
+    Pages are looked up and extracted STREAM_BLOCK at a time, so memory use
+    does not grow with the length of the document. `data` is the file's
+    content when the caller has already read it (see extract_pipelined()).
+    """
+    cache = get_cache()
+    doc = None
+    try:
+        if cache is None:
+            doc = open_pdf(pdf_path, data)
+            indices = page_indices if page_indices is not None else range(len(doc))
+            for i in indices:
+                if i < len(doc):
+                    yield {"page": i + 1, "text": doc[i].get_text(EXTRACT_MODE)}
+            return
+
+        digest = file_digest(cache, pdf_path, data)
+        row = cache.execute("SELECT pages FROM documents WHERE digest = ?", (digest,)).fetchone()
+        if row:
+            total_pages = row[0]
+        else:
+            doc = open_pdf(pdf_path, data)
+            total_pages = len(doc)
+            with cache:
+                cache.execute("INSERT OR REPLACE INTO documents VALUES (?, ?)", (digest, total_pages))
+
+        indices = page_indices if page_indices is not None else range(total_pages)
+        for block in _cached_blocks((i for i in indices if i < total_pages), STREAM_BLOCK):
+            marks = ",".join("?" * len(block))
+            found = dict(cache.execute(
+                f"SELECT page, text FROM pages WHERE digest = ? AND mode = ? AND page IN ({marks})",
+                (digest, EXTRACT_MODE, *(i + 1 for i in block)),
+            ).fetchall())
+            missing = [i for i in block if i + 1 not in found]
+            if missing and doc is None:
+                doc = open_pdf(pdf_path, data)
+            # Extract outside the transaction: holding the write lock through
+            # get_text() would serialize every worker sharing the cache.
+            extracted = [(i, doc[i].get_text(EXTRACT_MODE)) for i in missing]
+            now = time.time()
+            with cache:
+                if found:
+                    cache.executemany(
+                        "UPDATE pages SET last_used = ? WHERE digest = ? AND mode = ? AND page = ?",
+                        ((now, digest, EXTRACT_MODE, page) for page in found),
+                    )
+                if extracted:
+                    added = 0
+                    for i, text in extracted:
+                        size = len(text.encode("utf-8"))
+                        cur = cache.execute("INSERT OR IGNORE INTO pages VALUES (?, ?, ?, ?, ?, ?)",
+                                            (digest, EXTRACT_MODE, i + 1, text, size, now))
+                        added += size * cur.rowcount
+                        found[i + 1] = text
+                    cache.execute("UPDATE meta SET value = value + ? WHERE key = 'total_bytes'", (added,))
+                    _evict_cache(cache)
+            for i in block:
+                yield {"page": i + 1, "text": found[i + 1]}
+    finally:
+        if doc is not None:
+            doc.close()
+
+
+def page_count(pdf_path: Path) -> int:
+    cache = get_cache()
+    if cache is not None:
+        row = cache.execute("SELECT pages FROM documents WHERE digest = ?",
+                            (file_digest(cache, pdf_path),)).fetchone()
+        if row:
+            return row[0]
+    with fitz.open(str(pdf_path)) as doc:
+        return len(doc)
+
+
+def iter_pages(pdf_path: Path, page_indices: list[int] | None = None, data: bytes | None = None):
+    """Yield {"page", "text"} dicts one page at a time; the streaming form of extract_text_from_pdf()."""
+    for p in iter_raw_pages(pdf_path, page_indices, data):
+        yield {"page": p["page"], "text": p["text"].strip()}
+
+
 def extract_text_from_pdf(pdf_path: Path, page_indices: list[int] | None = None) -> list[dict]:
-    doc = fitz.open(str(pdf_path))
-    results = []
-    indices = page_indices if page_indices is not None else range(len(doc))
-    for i in indices:
-        if i >= len(doc):
-            continue
-        page = doc[i]
-        text = page.get_text("text").strip()
-        results.append({"page": i + 1, "text": text})
-    doc.close()
-    return results
+    return list(iter_pages(pdf_path, page_indices))
 
 
-def format_as_text(pages: list[dict], include_page_markers: bool = True) -> str:
-    parts = []
-    for p in pages:
+def iter_text_chunks(pages, include_page_markers: bool = True):
+    for n, p in enumerate(pages):
+        if n:
+            yield "\n\n"
         if include_page_markers:
-            parts.append(f"--- Page {p['page']} ---\n{p['text']}")
+            yield f"--- Page {p['page']} ---\n{p['text']}"
         else:
-            parts.append(p["text"])
-    return "\n\n".join(parts)
+            yield p["text"]
 
 
-def format_as_markdown(pages: list[dict], title: str = "") -> str:
-    lines = []
+def iter_markdown_chunks(pages, title: str = ""):
     if title:
-        lines.append(f"# {title}\n")
-    lines.append(f"*Extracted on {datetime.now().strftime('%Y-%m-%d %H:%M')}*\n")
+        yield f"# {title}\n\n"
+    yield f"*Extracted on {datetime.now().strftime('%Y-%m-%d %H:%M')}*\n"
+    for p in pages:
+        yield f"\n## Page {p['page']}\n\n{p['text']}\n"
+
+
+def iter_jsonl_chunks(pages, source: str = ""):
     for p in pages:
-        lines.append(f"## Page {p['page']}\n")
-        lines.append(p["text"])
-        lines.append("")
-    return "\n".join(lines)
+        record = {"file": source, "page": p["page"], "chars": len(p["text"]), "text": p["text"]}
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+def _write_parquet(pages, path: Path, source: str):
+    schema = pa.schema([("file", pa.string()), ("page", pa.int32()), ("chars", pa.int32()), ("text", pa.string())])
+    with pq.ParquetWriter(str(path), schema) as writer:
+        rows = []
+        for p in pages:
+            rows.append({"file": source, "page": p["page"], "chars": len(p["text"]), "text": p["text"]})
+            if len(rows) == PARQUET_ROW_GROUP:
+                writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+                rows = []
+        if rows:
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+
+
+def format_as_text(pages: list[dict], include_page_markers: bool = True) -> str:
+    return "".join(iter_text_chunks(pages, include_page_markers))
+
+
+def format_as_markdown(pages: list[dict], title: str = "") -> str:
+    return "".join(iter_markdown_chunks(pages, title))
+
+
+def write_pages(pages, out_path: Path, fmt: str, title: str = "", source: str = "") -> tuple[int, int]:
+    """Stream `pages` to `out_path` in `fmt`; returns (pages written, characters written).
+
+    Output goes to a ".part" file that is renamed into place on success, so a
+    failure part-way through never leaves a truncated result behind.
+    """
+    counts = [0, 0]
+
+    def counted():
+        for p in pages:
+            counts[0] += 1
+            counts[1] += len(p["text"])
+            yield p
+
+    tmp_path = out_path.with_name(out_path.name + ".part")
+    try:
+        if fmt == "parquet":
+            _write_parquet(counted(), tmp_path, source)
+        else:
+            if fmt == "markdown":
+                chunks = iter_markdown_chunks(counted(), title)
+            elif fmt == "jsonl":
+                chunks = iter_jsonl_chunks(counted(), source)
+            else:
+                chunks = iter_text_chunks(counted())
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return counts[0], counts[1]
 
 
 def cmd_extract(args):
@@ -89,10 +387,11 @@ def cmd_extract(args):
     if not pdf_path.exists():
         print(f"Error: File not found: {pdf_path}")
         return
+    if args.format == "parquet" and pq is None:
+        print("Missing dependency for parquet output. Please run: pip install pyarrow")
+        return
 
-    doc = fitz.open(str(pdf_path))
-    total_pages = len(doc)
-    doc.close()
+    total_pages = page_count(pdf_path)
 
     page_indices = None
     if args.pages:
@@ -101,24 +400,266 @@ def cmd_extract(args):
     else:
         print(f"Extracting all {total_pages} pages from: {pdf_path.name}")
 
-    pages = extract_text_from_pdf(pdf_path, page_indices)
-
-    if args.format == "markdown":
-        output = format_as_markdown(pages, title=pdf_path.stem)
-        ext = ".md"
-    else:
-        output = format_as_text(pages)
-        ext = ".txt"
-
     if args.output:
         out_path = Path(args.output)
     else:
-        out_path = pdf_path.with_suffix(ext)
+        out_path = pdf_path.with_suffix(FORMAT_EXTENSIONS[args.format])
 
-    out_path.write_text(output, encoding="utf-8")
-    chars = sum(len(p["text"]) for p in pages)
+    count, chars = write_pages(iter_pages(pdf_path, page_indices), out_path, args.format,
+                               title=pdf_path.stem, source=pdf_path.name)
     print(f"Saved to: {out_path}")
-    print(f"Pages extracted: {len(pages)} | Characters: {chars:,}")
+    print(f"Pages extracted: {count} | Characters: {chars:,}")
+
+
+def extract_page_range(pdf_path: str, start: int, stop: int) -> list[dict]:
+    return extract_text_from_pdf(Path(pdf_path), list(range(start, stop)))
+
+
+def extract_parallel(pdfs: list[Path], workers: int, chunk_pages: int = CHUNK_PAGES):
+    """Yield (pdf_path, pages, error) in input order, extracting on a process pool.
+
+    Large documents are split into page ranges of `chunk_pages`; `pages` is
+    an iterator that streams those ranges back in order and raises if one of
+    them failed. At most `workers * 2` ranges are in flight, so memory stays
+    bounded however many files are queued.
+    """
+    max_inflight = workers * 2
+    pending = deque()  # (pdf_path, futures, error)
+    current = deque()  # futures of the file being consumed
+    remaining = iter(pdfs)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=configure_cache,
+                             initargs=(_cache_settings["dir"], _cache_settings["max_bytes"])) as pool:
+
+        def fill():
+            inflight = len(current) + sum(len(futures) for _, futures, _ in pending)
+            while inflight < max_inflight:
+                pdf_path = next(remaining, None)
+                if pdf_path is None:
+                    return
+                try:
+                    total_pages = page_count(pdf_path)
+                except Exception as e:
+                    pending.append((pdf_path, deque(), e))
+                    continue
+                futures = deque(
+                    pool.submit(extract_page_range, str(pdf_path), start, min(start + chunk_pages, total_pages))
+                    for start in range(0, total_pages, chunk_pages)
+                )
+                pending.append((pdf_path, futures, None))
+                inflight += len(futures)
+
+        def stream():
+            while current:
+                chunk = current.popleft().result()
+                fill()
+                yield from chunk
+
+        fill()
+        while pending:
+            pdf_path, futures, error = pending.popleft()
+            if error is not None:
+                yield pdf_path, None, error
+            else:
+                current.extend(futures)
+                yield pdf_path, stream(), None
+                # The consumer may stop early (e.g. on a write error).
+                while current:
+                    current.popleft().cancel()
+            fill()
+
+
+def extract_serial(pdfs: list[Path]):
+    for pdf_path in pdfs:
+        yield pdf_path, iter_pages(pdf_path), None
+
+
+def extract_pipelined(pdfs: list[Path], io_threads: int = IO_THREADS, prefetch: int = PREFETCH):
+    """Yield (pdf_path, pages, error) in input order from a staged thread pipeline.
+
+    `io_threads` readers load whole files into memory, one extraction thread
+    turns them into pages, and the caller consumes the results as the write
+    stage. A semaphore caps the files read ahead at `prefetch`, and pages
+    reach the caller through a queue of STREAM_BLOCK pages, so a slow writer
+    applies backpressure all the way back to the readers and memory does not
+    grow with the length of a document.
+    """
+    jobs = queue.Queue()
+    for job in enumerate(pdfs):
+        jobs.put(job)
+    read_q = queue.Queue()  # (seq, pdf_path, data, error)
+    page_q = queue.Queue(maxsize=STREAM_BLOCK)  # per file, in input order: ("start", read error), pages, ("end", error)
+    slots = threading.Semaphore(prefetch)
+    stop = threading.Event()
+
+    def reader():
+        while True:
+            slots.acquire()
+            if stop.is_set():
+                return
+            try:
+                seq, pdf_path = jobs.get_nowait()
+            except queue.Empty:
+                slots.release()
+                return
+            try:
+                read_q.put((seq, pdf_path, pdf_path.read_bytes(), None))
+            except OSError as e:
+                read_q.put((seq, pdf_path, None, e))
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                page_q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def extractor():
+        # Files are extracted in input order, so pages can stream straight
+        # to the writer; reads that finish early wait here.
+        ready = {}
+        for seq in range(len(pdfs)):
+            while seq not in ready:
+                try:
+                    item = read_q.get(timeout=0.1)
+                except queue.Empty:
+                    if stop.is_set():
+                        return
+                    continue
+                ready[item[0]] = item[1:]
+            pdf_path, data, error = ready.pop(seq)
+            if not put(("start", error)):
+                return
+            if error is None:
+                try:
+                    for page in iter_pages(pdf_path, data=data):
+                        if not put(("page", page)):
+                            return
+                except Exception as e:
+                    error = e
+                if not put(("end", error)):
+                    return
+            del data
+            slots.release()
+
+    def pages():
+        while True:
+            kind, value = page_q.get()
+            if kind == "end":
+                if value is not None:
+                    raise value
+                return
+            yield value
+
+    threads = [threading.Thread(target=reader, daemon=True) for _ in range(max(1, io_threads))]
+    threads.append(threading.Thread(target=extractor, daemon=True))
+    for t in threads:
+        t.start()
+
+    try:
+        for pdf_path in pdfs:
+            _, error = page_q.get()
+            if error is not None:
+                yield pdf_path, None, error
+                continue
+            stream = pages()
+            yield pdf_path, stream, None
+            try:
+                for _ in stream:  # drain whatever the caller didn't read
+                    pass
+            except Exception:
+                pass
+    finally:
+        stop.set()
+        for _ in threads:
+            slots.release()
+
+
+def run_extraction(pdfs: list[Path], workers: int = 1, chunk_pages: int = CHUNK_PAGES, pipeline: bool = False,
+                   io_threads: int = IO_THREADS, prefetch: int = PREFETCH):
+    if workers > 1:
+        return extract_parallel(pdfs, workers, chunk_pages)
+    if pipeline:
+        return extract_pipelined(pdfs, io_threads, prefetch)
+    return extract_serial(pdfs)
+
+
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+def engine_options(args) -> dict:
+    return {
+        "workers": args.workers if args.workers > 0 else os.cpu_count() or 1,
+        "chunk_pages": getattr(args, "chunk_pages", CHUNK_PAGES),
+        "pipeline": args.pipeline,
+        "io_threads": args.io_threads,
+        "prefetch": args.prefetch,
+    }
+
+
+def open_manifest(path: Path):
+    """Open the manifest for appending, first cutting off a torn final line
+    left by an interrupted run so the next record starts on a line of its own."""
+    with open(path, "ab+") as f:
+        size = end = f.seek(0, os.SEEK_END)
+        keep = 0
+        while end > 0:
+            start = max(0, end - 4096)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline >= 0:
+                keep = start + newline + 1
+                break
+            end = start
+        if keep < size:
+            f.truncate(keep)
+    return open(path, "a", encoding="utf-8")
+
+
+def load_manifest(path: Path) -> dict:
+    """Latest manifest record per source path; later lines override earlier ones."""
+    records = {}
+    if not path.exists():
+        return records
+    lines = 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            lines += 1
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn final line from an interrupted run
+            records[record["path"]] = record
+    if lines > 2 * len(records) + 100:
+        tmp_path = path.with_name(path.name + ".part")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in records.values():
+                f.write(json.dumps(record) + "\n")
+        os.replace(tmp_path, path)
+    return records
+
+
+def find_pdfs(folder: Path, recursive: bool, exclude: Path | None = None) -> list[Path]:
+    if not recursive:
+        return sorted(folder.glob("*.pdf"))
+    pdfs = []
+    for root, dirs, files in os.walk(folder):
+        if exclude is not None:
+            dirs[:] = [d for d in dirs if Path(root, d) != exclude]
+        dirs.sort()
+        pdfs.extend(Path(root, name) for name in sorted(files) if name.lower().endswith(".pdf"))
+    return pdfs
+
+
+def content_hash(pdf_path: Path) -> str:
+    cache = get_cache()
+    return file_digest(cache, pdf_path) if cache is not None else sha256_file(pdf_path)
 
 
 def cmd_batch(args):
@@ -126,32 +667,458 @@ def cmd_batch(args):
     if not folder.is_dir():
         print(f"Error: '{folder}' is not a valid directory.")
         return
+    if args.format == "parquet" and pq is None:
+        print("Missing dependency for parquet output. Please run: pip install pyarrow")
+        return
 
-    pdfs = list(folder.glob("*.pdf"))
+    out_folder = folder / "extracted"
+    pdfs = find_pdfs(folder, args.recursive, exclude=out_folder)
     if not pdfs:
         print("No PDF files found in the folder.")
         return
 
-    out_folder = folder / "extracted"
     out_folder.mkdir(exist_ok=True)
+    manifest_path = out_folder / MANIFEST_FILE
+    manifest = {} if args.force else load_manifest(manifest_path)
 
-    print(f"Found {len(pdfs)} PDF file(s). Saving to: {out_folder}/\n")
-    for pdf_path in pdfs:
-        print(f"Processing: {pdf_path.name}...", end=" ", flush=True)
-        try:
-            pages = extract_text_from_pdf(pdf_path)
-            if args.format == "markdown":
-                output = format_as_markdown(pages, title=pdf_path.stem)
-                out_path = out_folder / pdf_path.with_suffix(".md").name
-            else:
-                output = format_as_text(pages)
-                out_path = out_folder / pdf_path.with_suffix(".txt").name
-            out_path.write_text(output, encoding="utf-8")
-            print(f"Done ({len(pages)} pages)")
-        except Exception as e:
-            print(f"FAILED — {e}")
+    ext = FORMAT_EXTENSIONS[args.format]
+    jobs = {}  # pdf_path -> (relative path, output path, stat)
+    skipped = 0
+    with open_manifest(manifest_path) as manifest_file:
+        for pdf_path in pdfs:
+            rel = pdf_path.relative_to(folder).as_posix()
+            out_path = out_folder / Path(rel).with_suffix(ext)
+            st = pdf_path.stat()
+            record = manifest.get(rel)
+            if (record and record["status"] == "done" and record["output"] == out_path.relative_to(out_folder).as_posix()
+                    and out_path.exists()):
+                if record["size"] == st.st_size and record["mtime"] == st.st_mtime:
+                    skipped += 1
+                    continue
+                # Touched but possibly unchanged (e.g. re-copied): compare content before re-extracting.
+                if record["size"] == st.st_size and record["hash"] == content_hash(pdf_path):
+                    record.update(mtime=st.st_mtime)
+                    manifest_file.write(json.dumps(record) + "\n")
+                    skipped += 1
+                    continue
+            jobs[pdf_path] = (rel, out_path, st)
+
+    engine = engine_options(args)
+    print(f"Found {len(pdfs)} PDF file(s). Saving to: {out_folder}/")
+    if skipped:
+        print(f"Skipping {skipped} unchanged file(s) already in {MANIFEST_FILE}.")
+    if engine["workers"] > 1 and jobs:
+        print(f"Using {engine['workers']} worker processes.")
+    elif engine["pipeline"] and jobs:
+        print(f"Using pipeline: {engine['io_threads']} reader thread(s), {engine['prefetch']} file(s) prefetched.")
+    print()
+
+    results = run_extraction(list(jobs), **engine)
 
+    started = time.perf_counter()
+    done_files = 0
+    done_pages = 0
+    failed = 0
+    with open_manifest(manifest_path) as manifest_file:
+        for pdf_path, pages, error in results:
+            rel, out_path, st = jobs[pdf_path]
+            print(f"Processing: {rel}...", end=" ", flush=True)
+            record = {
+                "path": rel, "size": st.st_size, "mtime": st.st_mtime, "hash": None,
+                "output": out_path.relative_to(out_folder).as_posix(), "status": "failed",
+            }
+            if error is None:
+                try:
+                    out_path.parent.mkdir(parents=True, exist_ok=True)
+                    count, _ = write_pages(pages, out_path, args.format, title=pdf_path.stem, source=rel)
+                    record.update(status="done", pages=count, hash=content_hash(pdf_path))
+                    print(f"Done ({count} pages)")
+                    done_files += 1
+                    done_pages += count
+                except Exception as e:
+                    error = e
+            if error is not None:
+                record["error"] = str(error)
+                print(f"FAILED — {error}")
+                failed += 1
+            manifest_file.write(json.dumps(record) + "\n")
+            manifest_file.flush()
+
+    elapsed = max(time.perf_counter() - started, 1e-9)
     print(f"\nBatch extraction complete. Results in: {out_folder}")
+    if failed:
+        print(f"{failed} file(s) failed and will be retried on the next run.")
+    print(
+        f"Throughput: {done_files} file(s), {done_pages:,} page(s) in {elapsed:.2f}s "
+        f"— {done_pages / elapsed:,.1f} pages/sec, {done_files / elapsed:,.2f} files/sec"
+    )
+
+
+def open_index(db_path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(str(db_path))
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS files (
+            id INTEGER PRIMARY KEY, path TEXT UNIQUE, size INTEGER, mtime REAL, error TEXT
+        );
+        CREATE TABLE IF NOT EXISTS pages (
+            id INTEGER PRIMARY KEY, file_id INTEGER, page INTEGER, text TEXT
+        );
+        CREATE TABLE IF NOT EXISTS terms (id INTEGER PRIMARY KEY, term TEXT UNIQUE);
+        CREATE TABLE IF NOT EXISTS postings (
+            term_id INTEGER, page_id INTEGER, PRIMARY KEY (term_id, page_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS pages_file ON pages(file_id);
+        CREATE INDEX IF NOT EXISTS postings_page ON postings(page_id);
+    """)
+    return conn
+
+
+def _drop_indexed_file(conn: sqlite3.Connection, file_id: int):
+    conn.execute("DELETE FROM postings WHERE page_id IN (SELECT id FROM pages WHERE file_id = ?)", (file_id,))
+    conn.execute("DELETE FROM pages WHERE file_id = ?", (file_id,))
+    conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+
+def _store_indexed_file(conn: sqlite3.Connection, name: str, st: os.stat_result,
+                        pages, error: Exception | None) -> int:
+    cur = conn.execute(
+        "INSERT INTO files (path, size, mtime, error) VALUES (?, ?, ?, ?)",
+        (name, st.st_size, st.st_mtime, str(error) if error else None),
+    )
+    file_id = cur.lastrowid
+    count = 0
+    for p in pages or []:
+        count += 1
+        page_id = conn.execute(
+            "INSERT INTO pages (file_id, page, text) VALUES (?, ?, ?)", (file_id, p["page"], p["text"])
+        ).lastrowid
+        terms = set(TOKEN_RE.findall(p["text"].lower()))
+        conn.executemany("INSERT OR IGNORE INTO terms (term) VALUES (?)", ((t,) for t in terms))
+        conn.executemany(
+            "INSERT OR IGNORE INTO postings SELECT id, ? FROM terms WHERE term = ?",
+            ((page_id, t) for t in terms),
+        )
+    return count
+
+
+def update_index(conn: sqlite3.Connection, pdfs: list[Path], verbose: bool = False, **engine) -> dict:
+    """Bring the index in line with `pdfs`, re-extracting only new or changed files."""
+    known = {path: (file_id, size, mtime) for file_id, path, size, mtime
+             in conn.execute("SELECT id, path, size, mtime FROM files")}
+    stale = []
+    stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0, "failed": 0}
+    current = {}
+    for pdf_path in pdfs:
+        st = pdf_path.stat()
+        current[pdf_path.name] = st
+        row = known.get(pdf_path.name)
+        if row and row[1] == st.st_size and row[2] == st.st_mtime:
+            stats["unchanged"] += 1
+        else:
+            stale.append(pdf_path)
+
+    for name, (file_id, _, _) in known.items():
+        if name not in current:
+            _drop_indexed_file(conn, file_id)
+            stats["removed"] += 1
+    conn.commit()
+
+    results = run_extraction(stale, **engine)
+    for pdf_path, pages, error in results:
+        row = known.get(pdf_path.name)
+        count = 0
+        if error is None:
+            try:
+                with conn:
+                    if row:
+                        _drop_indexed_file(conn, row[0])
+                    count = _store_indexed_file(conn, pdf_path.name, current[pdf_path.name], pages, None)
+            except Exception as e:
+                error = e
+        if error is not None:
+            with conn:
+                if row:
+                    _drop_indexed_file(conn, row[0])
+                _store_indexed_file(conn, pdf_path.name, current[pdf_path.name], None, error)
+            stats["failed"] += 1
+            if verbose:
+                print(f"Indexing: {pdf_path.name}... FAILED — {error}")
+        else:
+            stats["updated" if row else "added"] += 1
+            if verbose:
+                print(f"Indexing: {pdf_path.name}... Done ({count} pages)")
+    return stats
+
+
+def _indexed_pages(conn: sqlite3.Connection, words: list[str], substring: bool = False):
+    """Indexed (file name, page, text) rows that have a term starting with each of `words`.
+
+    Prefixes are a range seek on the terms index. With `substring`, a word may
+    appear anywhere in a term, which scans the whole vocabulary instead.
+    """
+    if not words:
+        return conn.execute(
+            "SELECT f.path, p.page, p.text FROM pages p JOIN files f ON f.id = p.file_id ORDER BY f.path, p.page"
+        )
+    if substring:
+        term_match, params = "instr(term, ?) > 0", words
+    else:
+        # Every term starting with `word` sorts between it and word + the highest code point.
+        term_match, params = "term >= ? AND term < ?", [b for w in words for b in (w, w + "\U0010ffff")]
+    candidates = " INTERSECT ".join(
+        f"SELECT page_id FROM postings WHERE term_id IN (SELECT id FROM terms WHERE {term_match})"
+        for _ in words
+    )
+    query = f"""
+        SELECT f.path, p.page, p.text FROM pages p JOIN files f ON f.id = p.file_id
+        WHERE p.id IN ({candidates}) ORDER BY f.path, p.page
+    """
+    return conn.execute(query, params)
+
+
+def search_index(conn: sqlite3.Connection, keyword: str, substring: bool = False):
+    """Yield (file name, page number, page text) for indexed pages containing `keyword`.
+
+    Words of the keyword are matched from the start of indexed words unless
+    `substring` is set.
+    """
+    for name, page, text in _indexed_pages(conn, TOKEN_RE.findall(keyword), substring):
+        if keyword in text.lower():
+            yield name, page, text
+
+
+class SearchQuery:
+    """A compiled boolean query: words, "phrases" and /regexes/ joined by AND, OR, NOT and parentheses.
+
+    All literal terms are matched together in one pass over the page text: a
+    single alternation (longest term first) finds the longest term starting at
+    each position, and the shorter terms it begins with are credited from a
+    precomputed prefix table, as an Aho-Corasick output link would.
+    """
+
+    TOKEN = re.compile(r'''\s*(\(|\)|"[^"]*"|/(?:\\.|[^/\\])+/|[^\s()"]+)''')
+
+    def __init__(self, text: str):
+        self.text = text
+        self.literals = []  # normalized lowercase words and phrases
+        self.regexes = []  # compiled /.../ terms
+        self.terms = []  # ("literal" | "regex", index) per term id
+        self._tokens = self.TOKEN.findall(text)
+        if not self._tokens:
+            raise ValueError("empty query")
+        self._pos = 0
+        self.tree = self._parse_or()
+        if self._pos != len(self._tokens):
+            raise ValueError(f"unexpected '{self._tokens[self._pos]}'")
+        del self._tokens
+
+        ordered = sorted(range(len(self.literals)), key=lambda i: -len(self.literals[i]))
+        self._order = ordered
+        self._literal_re = None
+        if ordered:
+            alternatives = "|".join(
+                "(" + r"\s+".join(re.escape(w) for w in self.literals[i].split()) + ")" for i in ordered
+            )
+            self._literal_re = re.compile(f"(?=(?:{alternatives}))")
+        self._prefixes = [
+            [j for j, other in enumerate(self.literals) if j != i and lit.startswith(other)]
+            for i, lit in enumerate(self.literals)
+        ]
+        # Regexes are highlighted with their own compiled patterns: joining them
+        # into one would misplace inline flags and renumber backreferences.
+        self._highlight = list(self.regexes)
+        if ordered:
+            literals = "|".join(r"\s+".join(re.escape(w) for w in self.literals[i].split()) for i in ordered)
+            self._highlight.insert(0, re.compile(literals, re.IGNORECASE))
+
+    # Parsing -------------------------------------------------------------
+
+    def _peek(self):
+        return self._tokens[self._pos] if self._pos < len(self._tokens) else None
+
+    def _parse_or(self):
+        node = self._parse_and()
+        while self._peek() == "OR":
+            self._pos += 1
+            node = ("or", node, self._parse_and())
+        return node
+
+    def _parse_and(self):
+        node = self._parse_unary()
+        while self._peek() not in (None, "OR", ")"):
+            if self._peek() == "AND":
+                self._pos += 1
+            node = ("and", node, self._parse_unary())
+        return node
+
+    def _parse_unary(self):
+        if self._peek() == "NOT":
+            self._pos += 1
+            return ("not", self._parse_unary())
+        return self._parse_primary()
+
+    def _parse_primary(self):
+        token = self._peek()
+        if token is None or token in ("AND", "OR", ")"):
+            raise ValueError(f"expected a term, got '{token or 'end of query'}'")
+        self._pos += 1
+        if token == "(":
+            node = self._parse_or()
+            if self._peek() != ")":
+                raise ValueError("missing ')'")
+            self._pos += 1
+            return node
+        if token.startswith("/") and token.endswith("/") and len(token) > 2:
+            try:
+                self.regexes.append(re.compile(token[1:-1], re.IGNORECASE))
+            except re.error as e:
+                raise ValueError(f"bad regex {token}: {e}") from None
+            self.terms.append(("regex", len(self.regexes) - 1))
+            return ("term", len(self.terms) - 1)
+        literal = " ".join(token.strip('"').lower().split())
+        if not literal:
+            raise ValueError("empty phrase")
+        if literal not in self.literals:
+            self.literals.append(literal)
+        self.terms.append(("literal", self.literals.index(literal)))
+        return ("term", len(self.terms) - 1)
+
+    # Matching ------------------------------------------------------------
+
+    def count_terms(self, text: str) -> list[int]:
+        """Hits per term id, from one scan for all literals plus one per regex."""
+        literal_hits = [0] * len(self.literals)
+        if self._literal_re is not None:
+            for m in self._literal_re.finditer(text.lower()):
+                longest = self._order[m.lastindex - 1]
+                literal_hits[longest] += 1
+                for j in self._prefixes[longest]:
+                    literal_hits[j] += 1
+        regex_hits = [sum(1 for _ in r.finditer(text)) for r in self.regexes]
+        return [literal_hits[i] if kind == "literal" else regex_hits[i] for kind, i in self.terms]
+
+    def _evaluate(self, node, hits: list[int]) -> bool:
+        if node[0] == "term":
+            return hits[node[1]] > 0
+        if node[0] == "not":
+            return not self._evaluate(node[1], hits)
+        if node[0] == "and":
+            return self._evaluate(node[1], hits) and self._evaluate(node[2], hits)
+        return self._evaluate(node[1], hits) or self._evaluate(node[2], hits)
+
+    def _positive_terms(self, node, negated: bool = False) -> set[int]:
+        if node[0] == "term":
+            return set() if negated else {node[1]}
+        if node[0] == "not":
+            return self._positive_terms(node[1], not negated)
+        return self._positive_terms(node[1], negated) | self._positive_terms(node[2], negated)
+
+    def score(self, text: str) -> int:
+        """Number of hits on the query's positive terms, or 0 if the page does not match."""
+        hits = self.count_terms(text)
+        if not self._evaluate(self.tree, hits):
+            return 0
+        return max(1, sum(hits[t] for t in self._positive_terms(self.tree)))
+
+    def required_words(self) -> list[str]:
+        """Words that every matching page must contain, for narrowing index lookups."""
+        def required(node) -> set[str]:
+            if node[0] == "term":
+                kind, i = self.terms[node[1]]
+                return set(TOKEN_RE.findall(self.literals[i])) if kind == "literal" else set()
+            if node[0] == "and":
+                return required(node[1]) | required(node[2])
+            if node[0] == "or":
+                return required(node[1]) & required(node[2])
+            return set()
+        return sorted(required(self.tree))
+
+    def matching_lines(self, text: str) -> list[str]:
+        return [l.strip() for l in text.split("\n") if l.strip() and any(r.search(l) for r in self._highlight)]
+
+    def highlight(self, line: str) -> str:
+        spans = sorted((m.span() for r in self._highlight for m in r.finditer(line) if m.end() > m.start()),
+                       key=lambda span: (span[0], -span[1]))
+        out = []
+        pos = 0
+        for start, end in spans:
+            if start >= pos:  # leftmost, then longest; overlapping matches are skipped
+                out.append(f"{line[pos:start]}[{line[start:end]}]")
+                pos = end
+        return "".join(out) + line[pos:]
+
+
+def query_index(conn: sqlite3.Connection, query: SearchQuery, substring: bool = False) -> sqlite3.Cursor:
+    return _indexed_pages(conn, query.required_words(), substring)
+
+
+def search_pdfs(pdfs: list[Path], keyword: str | None = None, **engine):
+    for pdf_path, pages, error in run_extraction(pdfs, **engine):
+        if error is None:
+            try:
+                for p in pages:
+                    if keyword is None or keyword in p["text"].lower():
+                        yield pdf_path.name, p["page"], p["text"]
+            except Exception as e:
+                error = e
+        if error is not None:
+            # One unreadable file must not end the search, as in batch and the index.
+            print(f"(Skipped {pdf_path.name}: {error})")
+
+
+def index_path(folder: Path, override: str | None) -> Path:
+    return Path(override) if override else folder / INDEX_FILE
+
+
+def cmd_index(args):
+    folder = Path(args.folder)
+    if not folder.is_dir():
+        print(f"Error: '{folder}' is not a valid directory.")
+        return
+
+    db_path = index_path(folder, args.index)
+    if args.rebuild and db_path.exists():
+        db_path.unlink()
+
+    pdfs = list(folder.glob("*.pdf"))
+    print(f"Indexing {len(pdfs)} PDF file(s) into: {db_path}\n")
+    started = time.perf_counter()
+    conn = open_index(db_path)
+    stats = update_index(conn, pdfs, verbose=True, **engine_options(args))
+    conn.close()
+    print(
+        f"\nIndex up to date in {time.perf_counter() - started:.2f}s — "
+        f"{stats['added']} added, {stats['updated']} updated, {stats['removed']} removed, "
+        f"{stats['unchanged']} unchanged, {stats['failed']} failed."
+    )
+
+
+def print_query_results(query: SearchQuery, hits, max_results: int | None, total_files: int):
+    files = {}
+    found = 0
+    for name, page, text in hits:
+        score = query.score(text)
+        if not score:
+            continue
+        files.setdefault(name, []).append({"page": page, "hits": score, "lines": query.matching_lines(text)[:3]})
+        found += 1
+        if max_results and found >= max_results:
+            break
+
+    ranked = sorted(files.items(), key=lambda item: -sum(m["hits"] for m in item[1]))
+    for name, matches in ranked:
+        print(f"Found in: {name} ({sum(m['hits'] for m in matches)} hit(s))")
+        for m in sorted(matches, key=lambda m: -m["hits"]):
+            print(f"  Page {m['page']} ({m['hits']} hit(s)):")
+            for line in m["lines"]:
+                print(f"    ...{query.highlight(line)}...")
+        print()
+
+    if found == 0:
+        print(f"No matches found for '{query.text}'.")
+    else:
+        limited = " (stopped at --max-results)" if max_results and found >= max_results else ""
+        print(f"Total: {found} matching page(s) across {len(files)} of {total_files} file(s){limited}.")
 
 
 def cmd_search(args):
@@ -165,28 +1132,73 @@ def cmd_search(args):
         print("No PDF files found.")
         return
 
-    keyword = args.keyword.lower()
-    print(f"Searching for '{args.keyword}' in {len(pdfs)} PDF(s)...\n")
+    query = None
+    if args.query is not None:
+        try:
+            query = SearchQuery(args.query)
+        except ValueError as e:
+            print(f"Error: invalid query — {e}")
+            return
+        print(f"Searching for {args.query} in {len(pdfs)} PDF(s)...\n")
+    else:
+        keyword = args.keyword.lower()
+        print(f"Searching for '{args.keyword}' in {len(pdfs)} PDF(s)...\n")
+
+    conn = None
+    use_index = not args.no_index
+    if use_index:
+        try:
+            conn = open_index(index_path(folder, args.index))
+            stats = update_index(conn, pdfs, **engine_options(args))
+        except sqlite3.Error as e:
+            # e.g. a read-only folder: searching must still work without an index.
+            if conn is not None:
+                conn.close()
+                conn = None
+            print(f"(Index unavailable: {e}; scanning the files directly)\n")
+            use_index = False
+        else:
+            changed = stats["added"] + stats["updated"] + stats["removed"]
+            if changed:
+                print(f"(Index refreshed: {changed} file(s) changed)\n")
+    if use_index:
+        if query:
+            hits = query_index(conn, query, args.substring)
+        else:
+            hits = search_index(conn, keyword, args.substring)
+    else:
+        hits = search_pdfs(pdfs, None if query else keyword, **engine_options(args))
+
+    if query is not None:
+        print_query_results(query, hits, args.max_results, len(pdfs))
+        hits.close()  # results may stop early; finish with the cursor before its connection
+        if conn is not None:
+            conn.close()
+        return
+
+    file_matches = {}
+    found = 0
+    for name, page, text in hits:
+        lines = text.split("\n")
+        matching_lines = [l.strip() for l in lines if keyword in l.lower() and l.strip()]
+        file_matches.setdefault(name, []).append({"page": page, "lines": matching_lines[:3]})
+        found += 1
+        if args.max_results and found >= args.max_results:
+            break
+    hits.close()
+    if conn is not None:
+        conn.close()
 
     total_matches = 0
-    for pdf_path in pdfs:
-        pages = extract_text_from_pdf(pdf_path)
-        file_matches = []
-        for p in pages:
-            if keyword in p["text"].lower():
-                lines = p["text"].split("\n")
-                matching_lines = [l.strip() for l in lines if keyword in l.lower() and l.strip()]
-                file_matches.append({"page": p["page"], "lines": matching_lines[:3]})
-
-        if file_matches:
-            print(f"Found in: {pdf_path.name}")
-            for m in file_matches:
-                print(f"  Page {m['page']}:")
-                for line in m["lines"]:
-                    highlighted = re.sub(f"({re.escape(args.keyword)})", r"[\1]", line, flags=re.IGNORECASE)
-                    print(f"    ...{highlighted}...")
-            total_matches += len(file_matches)
-            print()
+    for name, matches in file_matches.items():
+        print(f"Found in: {name}")
+        for m in matches:
+            print(f"  Page {m['page']}:")
+            for line in m["lines"]:
+                highlighted = re.sub(f"({re.escape(args.keyword)})", r"[\1]", line, flags=re.IGNORECASE)
+                print(f"    ...{highlighted}...")
+        total_matches += len(matches)
+        print()
 
     if total_matches == 0:
         print(f"No matches found for '{args.keyword}'.")
@@ -194,61 +1206,202 @@ def cmd_search(args):
         print(f"Total: {total_matches} match(es) found across {len(pdfs)} file(s).")
 
 
+def pdf_info(pdf_path: str, chars: bool = False, sample: int = INFO_SAMPLE_PAGES) -> dict:
+    """Metadata and structure of one PDF without extracting its text (unless `chars`)."""
+    path = Path(pdf_path)
+    info = {"file": pdf_path, "size_kb": round(path.stat().st_size / 1024, 1)}
+    try:
+        with fitz.open(pdf_path) as doc:
+            meta = doc.metadata or {}
+            total = len(doc)
+            # Fonts are listed from the page resources, which is far cheaper than
+            # laying out text; a page that uses no fonts has no text layer.
+            picks = sorted({round(i * (total - 1) / max(sample - 1, 1)) for i in range(sample)}) if total else []
+            with_text = sum(1 for i in picks if doc.get_page_fonts(i))
+            first = doc[0].rect if total else None
+            info.update(
+                pages=total,
+                page_size=f"{first.width:.0f} x {first.height:.0f} pt" if first else None,
+                title=meta.get("title") or None,
+                author=meta.get("author") or None,
+                created=meta.get("creationDate") or None,
+                modified=meta.get("modDate") or None,
+                pdf_version=meta.get("format") or None,
+                encrypted=doc.is_encrypted,
+                outline_entries=len(doc.get_toc()),
+                text_layer="yes" if with_text == len(picks) and picks else "partial" if with_text else "no",
+            )
+        if chars:
+            info["characters"] = sum(len(p["text"]) for p in iter_raw_pages(path))
+    except Exception as e:
+        info["error"] = str(e)
+    return info
+
+
+def _info_task(job: tuple) -> dict:
+    return pdf_info(*job)
+
+
+def print_info(info: dict):
+    print(f"\nFile:       {Path(info['file']).name}")
+    if "error" in info:
+        print(f"Error:      {info['error']}")
+        return
+    print(f"Pages:      {info['pages']}")
+    print(f"Size:       {info['size_kb']:.1f} KB")
+    print(f"Page size:  {info['page_size'] or 'N/A'}")
+    print(f"Title:      {info['title'] or 'N/A'}")
+    print(f"Author:     {info['author'] or 'N/A'}")
+    print(f"Created:    {info['created'] or 'N/A'}")
+    print(f"Modified:   {info['modified'] or 'N/A'}")
+    print(f"Outline:    {info['outline_entries']} entries")
+    print(f"Text layer: {info['text_layer']}")
+    if "characters" in info:
+        print(f"Characters: {info['characters']:,}")
+
+
 def cmd_info(args):
-    pdf_path = Path(args.pdf)
-    if not pdf_path.exists():
-        print(f"Error: File not found: {pdf_path}")
+    target = Path(args.pdf)
+    if not target.exists():
+        print(f"Error: File not found: {target}")
         return
 
-    doc = fitz.open(str(pdf_path))
-    meta = doc.metadata
-    print(f"\nFile:       {pdf_path.name}")
-    print(f"Pages:      {len(doc)}")
-    print(f"Size:       {pdf_path.stat().st_size / 1024:.1f} KB")
-    print(f"Title:      {meta.get('title', 'N/A')}")
-    print(f"Author:     {meta.get('author', 'N/A')}")
-    print(f"Created:    {meta.get('creationDate', 'N/A')}")
-    print(f"Modified:   {meta.get('modDate', 'N/A')}")
-    total_chars = sum(len(doc[i].get_text()) for i in range(len(doc)))
-    print(f"Characters: {total_chars:,}")
-    doc.close()
+    if not target.is_dir():
+        info = pdf_info(str(target), args.chars)
+        if args.json:
+            print(json.dumps(info, indent=2))
+        else:
+            print_info(info)
+        return
+
+    pdfs = find_pdfs(target, args.recursive)
+    if not pdfs:
+        print("No PDF files found in the folder.")
+        return
+    jobs = [(str(p), args.chars) for p in pdfs]
+    workers = args.workers if args.workers > 0 else os.cpu_count() or 1
+    started = time.perf_counter()
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=configure_cache,
+                                 initargs=(_cache_settings["dir"], _cache_settings["max_bytes"])) as pool:
+            infos = list(pool.map(_info_task, jobs, chunksize=max(1, len(jobs) // (workers * 8))))
+    else:
+        infos = [_info_task(job) for job in jobs]
+    elapsed = time.perf_counter() - started
+    for info in infos:
+        info["file"] = Path(info["file"]).relative_to(target).as_posix()
+
+    if args.json:
+        print(json.dumps(infos, indent=2))
+        return
+
+    print(f"\n{'File':<40} {'Pages':>6} {'Size KB':>10} {'Text':<8} {'Outline':>7}" + (f" {'Chars':>12}" if args.chars else ""))
+    print("-" * (76 + (13 if args.chars else 0)))
+    for info in infos:
+        name = info["file"] if len(info["file"]) <= 40 else "..." + info["file"][-37:]
+        if "error" in info:
+            print(f"{name:<40} FAILED — {info['error']}")
+            continue
+        line = f"{name:<40} {info['pages']:>6} {info['size_kb']:>10,.1f} {info['text_layer']:<8} {info['outline_entries']:>7}"
+        if args.chars:
+            line += f" {info['characters']:>12,}"
+        print(line)
+    ok = [i for i in infos if "error" not in i]
+    print("-" * (76 + (13 if args.chars else 0)))
+    print(
+        f"{len(infos)} file(s), {sum(i['pages'] for i in ok):,} page(s), "
+        f"{sum(i['size_kb'] for i in ok) / 1024:,.1f} MB, "
+        f"{sum(1 for i in ok if i['text_layer'] == 'no')} without a text layer, "
+        f"{len(infos) - len(ok)} failed — {elapsed:.2f}s\n"
+    )
 
 
 def main():
     parser = argparse.ArgumentParser(description="Extract and organize text from PDF files.")
     subparsers = parser.add_subparsers(dest="command")
 
+    cache_opts = argparse.ArgumentParser(add_help=False)
+    cache_opts.add_argument("--cache-dir", default=str(CACHE_DIR),
+                            help=f"Extraction cache directory (default: {CACHE_DIR})")
+    cache_opts.add_argument("--cache-size-mb", type=int, default=CACHE_SIZE_MB,
+                            help=f"Evict least recently used pages above this size (default: {CACHE_SIZE_MB})")
+    cache_opts.add_argument("--no-cache", action="store_true", help="Do not read or write the extraction cache")
+
+    engine_opts = argparse.ArgumentParser(add_help=False)
+    engine_opts.add_argument("--workers", type=int, default=1,
+                             help="Worker processes to extract with (0 = one per CPU, default: 1)")
+    engine_opts.add_argument("--pipeline", action="store_true",
+                             help="Overlap file reads, extraction and writes using threads")
+    engine_opts.add_argument("--io-threads", type=positive_int, default=IO_THREADS,
+                             help=f"Concurrent file readers in --pipeline mode (default: {IO_THREADS})")
+    engine_opts.add_argument("--prefetch", type=positive_int, default=PREFETCH,
+                             help=f"Files read ahead of extraction in --pipeline mode, each held whole in memory; "
+                                  f"pages are streamed, so extraction waits while the writer catches up "
+                                  f"(default: {PREFETCH})")
+
     # extract
-    p_ext = subparsers.add_parser("extract", help="Extract text from a single PDF")
+    p_ext = subparsers.add_parser("extract", help="Extract text from a single PDF", parents=[cache_opts])
     p_ext.add_argument("pdf", help="Path to the PDF file")
-    p_ext.add_argument("--format", choices=["text", "markdown"], default="text")
+    p_ext.add_argument("--format", choices=list(FORMAT_EXTENSIONS), default="text")
     p_ext.add_argument("--pages", help="Page range, e.g. '1-5' or '1,3,5'")
     p_ext.add_argument("--output", help="Output file path (optional)")
 
     # batch
-    p_batch = subparsers.add_parser("batch", help="Extract all PDFs in a folder")
+    p_batch = subparsers.add_parser("batch", help="Extract all PDFs in a folder",
+                                    parents=[cache_opts, engine_opts])
     p_batch.add_argument("folder", help="Folder containing PDF files")
-    p_batch.add_argument("--format", choices=["text", "markdown"], default="text")
+    p_batch.add_argument("--format", choices=list(FORMAT_EXTENSIONS), default="text")
+    p_batch.add_argument("--recursive", action="store_true", help="Include PDFs in subfolders")
+    p_batch.add_argument("--force", action="store_true",
+                         help=f"Re-extract every PDF, ignoring {MANIFEST_FILE}")
+    p_batch.add_argument("--chunk-pages", type=positive_int, default=CHUNK_PAGES,
+                         help=f"Split documents into page ranges of this size across workers (default: {CHUNK_PAGES})")
+
+    # index
+    p_index = subparsers.add_parser("index", help="Build or refresh the search index for a folder",
+                                    parents=[cache_opts, engine_opts])
+    p_index.add_argument("folder", help="Folder containing PDF files")
+    p_index.add_argument("--index", help=f"Index file path (default: <folder>/{INDEX_FILE})")
+    p_index.add_argument("--rebuild", action="store_true", help="Discard the existing index and start over")
 
     # search
-    p_search = subparsers.add_parser("search", help="Search for a keyword across PDFs")
+    p_search = subparsers.add_parser("search", help="Search for a keyword across PDFs",
+                                     parents=[cache_opts, engine_opts])
     p_search.add_argument("folder", help="Folder containing PDF files")
-    p_search.add_argument("--keyword", required=True, help="Keyword to search for")
+    search_for = p_search.add_mutually_exclusive_group(required=True)
+    search_for.add_argument("--keyword", help="Keyword to search for")
+    search_for.add_argument("--query", help='Boolean query, e.g. \'"net profit" AND (q3 OR q4) NOT /draft\\d+/\'')
+    p_search.add_argument("--max-results", type=int, default=None,
+                          help="Stop after this many matching pages")
+    p_search.add_argument("--index", help=f"Index file path (default: <folder>/{INDEX_FILE})")
+    p_search.add_argument("--no-index", action="store_true",
+                          help="Scan the PDFs directly instead of using the search index")
+    p_search.add_argument("--substring", action="store_true",
+                          help="Also match inside longer words ('venue' finds 'revenue'); indexed searches "
+                               "otherwise match words from their start, which stays fast on large indexes")
 
     # info
-    p_info = subparsers.add_parser("info", help="Show PDF metadata and info")
-    p_info.add_argument("pdf", help="Path to the PDF file")
+    p_info = subparsers.add_parser("info", help="Show PDF metadata and info", parents=[cache_opts])
+    p_info.add_argument("pdf", help="Path to a PDF file or a folder of PDFs")
+    p_info.add_argument("--chars", action="store_true",
+                        help="Also count characters (extracts every page's text)")
+    p_info.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    p_info.add_argument("--recursive", action="store_true", help="Include PDFs in subfolders")
+    p_info.add_argument("--workers", type=int, default=0,
+                        help="Worker processes for folders (0 = one per CPU, default: 0)")
 
     args = parser.parse_args()
 
     commands = {
         "extract": cmd_extract,
         "batch": cmd_batch,
+        "index": cmd_index,
         "search": cmd_search,
         "info": cmd_info,
     }
 
     if args.command in commands:
+        configure_cache(None if args.no_cache else Path(args.cache_dir), args.cache_size_mb * 1024 * 1024)
         commands[args.command](args)
     else:
         parser.print_help()
@@ -5,54 +5,233 @@ Usage:
     # Add a product to monitor
     python price_monitor.py add --url "https://example.com/product" --selector ".price" --target 29.99 --name "My Product"
 
+    # Sites with structured data: read the price from JSON-LD, or with a regex, without parsing the page
+    python price_monitor.py add --url "https://example.com/product" --selector "json-ld" --target 29.99 --name "Shop A"
+    python price_monitor.py add --url "https://example.com/product" --selector 're:"price":\s*"([\d.]+)"' --target 29.99 --name "Shop B"
+
     # Check prices once
     python price_monitor.py check
 
-    # Monitor continuously (every 60 minutes)
+    # Check a long list faster: 32 requests at once, at most 2 per site, 1 per second per site
+    python price_monitor.py check --concurrency 32 --per-host 2 --host-rate 1
+
+    # See where check time goes, and keep a metrics file / Prometheus endpoint while watching
+    python price_monitor.py check --timing
+    python price_monitor.py watch --metrics-file metrics.json --metrics-port 9105
+
+    # Monitor continuously (each product about every 60 minutes; changing prices
+    # are checked more often, steady ones and failing sites less often)
     python price_monitor.py watch --interval 60
 
+    # Very large lists: 4 worker processes, each owning a share of the products
+    python price_monitor.py watch --shards 4
+
     # View all tracked products
     python price_monitor.py list
 
     # View price history
     python price_monitor.py history --name "My Product"
 
+    # Min/max, moving averages, % change and time since the low for every product
+    python price_monitor.py stats
+    # Daily averages for one product (also --bucket hour / week)
+    python price_monitor.py stats --name "My Product" --bucket day
+
     # Remove a product
     python price_monitor.py remove --name "My Product"
 
+    # Compare HTML parsers on your tracked pages (saved once as fixtures)
+    python price_monitor.py bench --fixtures ./fixtures
+
+Products, price history and page cache live in price_monitor.db (SQLite) in the
+current folder. Files from older versions (price_monitor_data.json,
+price_history.csv) are imported automatically the first time.
+
 Requirements:
     pip install requests beautifulsoup4
+    pip install lxml  # optional, much faster page parsing
 """
 
 import json
 import re
 import time
+import heapq
+import bisect
+import hashlib
+import os
+import queue
+import signal
+import multiprocessing
+import random
+import functools
+import importlib.util
 import argparse
 import csv
+import sqlite3
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
 
 try:
     import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
     from bs4 import BeautifulSoup
+    import soupsieve
 except ImportError:
     print("Missing dependencies. Please run: pip install requests beautifulsoup4")
     exit(1)
 
+# lxml is optional; BeautifulSoup loads it by name when it is installed.
+DEFAULT_PARSER = "lxml" if importlib.util.find_spec("lxml") else "html.parser"
+
+DB_FILE = Path("price_monitor.db")
+# Files used before the SQLite store; imported into it once, then left alone.
 DATA_FILE = Path("price_monitor_data.json")
 HISTORY_FILE = Path("price_history.csv")
+HTTP_CACHE_FILE = Path("price_monitor_http_cache.json")
+
+HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/120.0.0.0 Safari/537.36"
+    )
+}
+# Selectors that read the price straight from the page source, without building a tree.
+JSONLD_SELECTOR = "json-ld"
+REGEX_PREFIX = "re:"
+JSONLD_RE = re.compile(r"<script[^>]*application/ld\+json[^>]*>(.*?)</script>", re.IGNORECASE | re.DOTALL)
+
+# watch: each product's interval moves between these multiples of --interval.
+MIN_INTERVAL_FACTOR = 0.25
+MAX_INTERVAL_FACTOR = 4.0
+SPEEDUP = 0.5     # interval multiplier after a price change
+SLOWDOWN = 1.5    # interval multiplier after an unchanged price
+JITTER = 0.1      # ± fraction added to every interval so products drift apart
+RELOAD_SECONDS = 300  # longest sleep, so products added meanwhile are picked up
+COALESCE_SECONDS = 30  # products due this soon after a wake-up are checked in the same run
+
+# watch --shards: products are spread over worker processes on a consistent-hash
+# ring, and each check is guarded by a lease in the database.
+SHARD_VNODES = 64
+LEASE_SECONDS = 300  # longer than any check run; expired leases can be taken over
 
+CONCURRENCY = 8   # requests in flight across all sites
+PER_HOST = 2      # requests in flight to any one site
+HOST_RATE = 5.0   # new requests per second to any one site
 
-def load_data() -> dict:
-    if DATA_FILE.exists():
-        with open(DATA_FILE, "r") as f:
-            return json.load(f)
-    return {"products": []}
 
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    url TEXT NOT NULL,
+    selector TEXT NOT NULL,
+    target_price REAL NOT NULL,
+    added TEXT,
+    last_price REAL,
+    last_checked TEXT
+);
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    name TEXT NOT NULL,
+    url TEXT,
+    price REAL NOT NULL,
+    target REAL,
+    alert_triggered INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_name_time ON history (name, timestamp);
+CREATE INDEX IF NOT EXISTS history_time ON history (timestamp);
+-- ETag / Last-Modified and the results last read from each page, for conditional requests.
+CREATE TABLE IF NOT EXISTS http_cache (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    results TEXT NOT NULL
+);
+-- Hour/day/week aggregates of history, brought up to date by refresh_rollups().
+CREATE TABLE IF NOT EXISTS rollups (
+    bucket TEXT NOT NULL,
+    name TEXT NOT NULL,
+    start TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    total REAL NOT NULL,
+    low REAL NOT NULL,
+    high REAL NOT NULL,
+    PRIMARY KEY (bucket, name, start)
+);
+-- Which watch worker is checking a product right now (watch --shards).
+CREATE TABLE IF NOT EXISTS leases (
+    product_id INTEGER PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+# SQL for the start of each rollup bucket; weeks start on Monday.
+ROLLUP_BUCKETS = {
+    "hour": "strftime('%Y-%m-%d %H:00:00', timestamp)",
+    "day": "date(timestamp)",
+    "week": "date(timestamp, 'weekday 0', '-6 days')",
+}
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def open_store(path: Path = DB_FILE) -> sqlite3.Connection:
+    conn = sqlite3.connect(str(path), timeout=30)
+    conn.row_factory = sqlite3.Row
+    # WAL lets "list"/"history" read while a check is writing.
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    if conn.execute("SELECT 1 FROM meta WHERE key = 'migrated'").fetchone() is None:
+        migrate_legacy_files(conn)
+    return conn
+
+
+def migrate_legacy_files(conn: sqlite3.Connection):
+    """One-shot import of the old JSON product list, CSV history and HTTP cache."""
+    products = history = 0
+    with conn:
+        if DATA_FILE.exists():
+            with open(DATA_FILE, "r") as f:
+                rows = json.load(f).get("products", [])
+            products = conn.executemany(
+                "INSERT OR IGNORE INTO products (name, url, selector, target_price, added, last_price, last_checked) "
+                "VALUES (:name, :url, :selector, :target_price, :added, :last_price, :last_checked)",
+                [{"added": None, "last_price": None, "last_checked": None, **p} for p in rows],
+            ).rowcount
+        if HISTORY_FILE.exists():
+            with open(HISTORY_FILE, "r", newline="") as f:
+                history = conn.executemany(
+                    "INSERT INTO history (timestamp, name, url, price, target, alert_triggered) VALUES (?, ?, ?, ?, ?, ?)",
+                    ((r["timestamp"], r["name"], r["url"], float(r["price"]), float(r["target"]),
+                      int(r["alert_triggered"] == "True")) for r in csv.DictReader(f)),
+                ).rowcount
+        if HTTP_CACHE_FILE.exists():
+            try:
+                with open(HTTP_CACHE_FILE, "r") as f:
+                    save_http_cache(conn, json.load(f))
+                conn.execute("DELETE FROM http_cache WHERE url NOT IN (SELECT url FROM products)")
+            except (OSError, json.JSONDecodeError):
+                pass  # a damaged cache only costs one full download per page
+        conn.execute("INSERT INTO meta (key, value) VALUES ('migrated', ?)", (datetime.now().isoformat(),))
+    if products or history:
+        print(f"Moved {products} product(s) and {history} history row(s) into {DB_FILE}; "
+              f"{DATA_FILE} and {HISTORY_FILE} are no longer used.")
 
-def save_data(data: dict):
-    with open(DATA_FILE, "w") as f:
-        json.dump(data, f, indent=2)
+
+def load_products(conn: sqlite3.Connection) -> list[dict]:
+    return [dict(row) for row in conn.execute("SELECT * FROM products ORDER BY id")]
 
 
 def extract_price(text: str) -> float | None:
@@ -64,152 +243,1059 @@ def extract_price(text: str) -> float | None:
         return None
 
 
-def fetch_price(url: str, selector: str) -> tuple[float | None, str]:
-    headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/120.0.0.0 Safari/537.36"
-        )
-    }
+class HostLimiter:
+    """Feeds URLs to a thread pool so that no host has more than per_host
+    requests in flight, or starts more than `rate` of them a second.
+
+    The waiting happens here, before a task is submitted, so URLs for one
+    busy site never occupy pool threads that other sites could be using.
+    """
+
+    def __init__(self, per_host: int = PER_HOST, rate: float = HOST_RATE):
+        self.per_host = max(per_host, 1)
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self.cond = threading.Condition()
+        self.pending = {}  # host -> deque of (url, future) not yet submitted
+        self.active = {}
+        self.next_start = {}
+        self.stopped = False
+        self.thread = None
+
+    def submit_all(self, pool: ThreadPoolExecutor, urls, fn) -> dict[str, Future]:
+        """Schedule fn(url) for every URL; returns a future per URL."""
+        futures = {}
+        for url in urls:
+            host = urlsplit(url).netloc.lower()
+            futures[url] = Future()
+            self.pending.setdefault(host, deque()).append((url, futures[url]))
+        self.thread = threading.Thread(target=self._dispatch, args=(pool, fn), daemon=True)
+        self.thread.start()
+        return futures
+
+    def close(self):
+        """Stop submitting; futures that never started are cancelled."""
+        with self.cond:
+            self.stopped = True
+            self.cond.notify()
+        if self.thread is not None:
+            self.thread.join()
+        for waiting in self.pending.values():
+            for _, future in waiting:
+                future.cancel()
+
+    def _run(self, host, url, future, fn):
+        try:
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(url))
+                except BaseException as e:
+                    future.set_exception(e)
+        finally:
+            with self.cond:
+                self.active[host] -= 1
+                self.cond.notify()
+
+    def _dispatch(self, pool, fn):
+        with self.cond:
+            while self.pending and not self.stopped:
+                now = time.monotonic()
+                wake = None
+                submitted = False
+                # One URL per host per pass, so hosts take turns.
+                for host in list(self.pending):
+                    if self.active.get(host, 0) >= self.per_host:
+                        continue
+                    start = self.next_start.get(host, now)
+                    if start > now:
+                        wake = start if wake is None else min(wake, start)
+                        continue
+                    url, future = self.pending[host].popleft()
+                    if not self.pending[host]:
+                        del self.pending[host]
+                    self.active[host] = self.active.get(host, 0) + 1
+                    self.next_start[host] = now + self.interval
+                    pool.submit(self._run, host, url, future, fn)
+                    submitted = True
+                if self.pending and not submitted:
+                    self.cond.wait(None if wake is None else wake - time.monotonic())
+
+
+STAGES = ("queue", "connect", "server", "download", "parse")
+FAILURE_REASONS = (
+    ("Request error: ", "request_error"),
+    ("Could not parse", "parse_fail"),
+    ("Invalid selector", "invalid_selector"),
+    ("Bad regex", "invalid_selector"),
+)
+HTTP_ERROR_RE = re.compile(r"^Request error: \d{3} ")
+
+
+class Metrics:
+    """Stage timings and outcome counters, shared by the check threads.
+
+    Counters only grow, so one instance can live for a whole watch session
+    and be scraped at any time.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {stage: [0, 0.0, 0.0] for stage in STAGES}  # count, total seconds, max seconds
+        self.counters = {}  # (metric, label) -> count
+        self.runs = 0
+        self.last_run = {"time": None, "seconds": None}
+
+    def time(self, stage: str, seconds: float):
+        with self.lock:
+            entry = self.stages[stage]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    @contextmanager
+    def timer(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.time(stage, time.perf_counter() - started)
+
+    def count(self, metric: str, label: str, n: int = 1):
+        with self.lock:
+            self.counters[metric, label] = self.counters.get((metric, label), 0) + n
+
+    def count_result(self, price: float | None, status: str):
+        if price is not None:
+            self.count("checks", "ok")
+            return
+        reason = "selector_miss"
+        if HTTP_ERROR_RE.match(status):
+            reason = "http_error"
+        else:
+            for prefix, name in FAILURE_REASONS:
+                if status.startswith(prefix):
+                    reason = name
+                    break
+        self.count("checks", reason)
+
+    def finish_run(self, seconds: float):
+        with self.lock:
+            self.runs += 1
+            self.last_run = {"time": time.time(), "seconds": seconds}
+
+    def to_json(self) -> dict:
+        with self.lock:
+            counters = {}
+            for (metric, label), value in sorted(self.counters.items()):
+                counters.setdefault(metric, {})[label] = value
+            return {
+                "runs": self.runs,
+                "last_run": dict(self.last_run),
+                "stages": {
+                    stage: {"count": n, "total_seconds": round(total, 6), "max_seconds": round(peak, 6)}
+                    for stage, (n, total, peak) in self.stages.items()
+                },
+                "counters": counters,
+            }
+
+    def to_prometheus(self) -> str:
+        data = self.to_json()
+        lines = [
+            "# HELP price_monitor_stage_seconds Time spent in each stage of fetching prices.",
+            "# TYPE price_monitor_stage_seconds summary",
+        ]
+        for stage, entry in data["stages"].items():
+            lines.append(f'price_monitor_stage_seconds_sum{{stage="{stage}"}} {entry["total_seconds"]}')
+            lines.append(f'price_monitor_stage_seconds_count{{stage="{stage}"}} {entry["count"]}')
+        help_text = {
+            "checks": "Product checks by result.",
+            "requests": "Page requests by result.",
+            "connections": "New connections opened (DNS, TCP and TLS).",
+        }
+        for metric, labels in data["counters"].items():
+            lines.append(f"# HELP price_monitor_{metric}_total {help_text.get(metric, '')}")
+            lines.append(f"# TYPE price_monitor_{metric}_total counter")
+            for label, value in labels.items():
+                lines.append(f'price_monitor_{metric}_total{{result="{label}"}} {value}')
+        lines.append("# TYPE price_monitor_runs_total counter")
+        lines.append(f"price_monitor_runs_total {data['runs']}")
+        if data["last_run"]["time"] is not None:
+            lines.append("# TYPE price_monitor_last_run_timestamp_seconds gauge")
+            lines.append(f"price_monitor_last_run_timestamp_seconds {data['last_run']['time']:.3f}")
+            lines.append("# TYPE price_monitor_last_run_duration_seconds gauge")
+            lines.append(f"price_monitor_last_run_duration_seconds {data['last_run']['seconds']:.6f}")
+        return "\n".join(lines) + "\n"
+
+    def print_summary(self):
+        print(f"\n{'Stage':<10} {'Count':>7} {'Total':>9} {'Average':>9} {'Max':>9}")
+        print("-" * 48)
+        for stage, (n, total, peak) in self.stages.items():
+            average = total / n if n else 0.0
+            print(f"{stage:<10} {n:>7} {total:>8.2f}s {average * 1000:>7.1f}ms {peak * 1000:>7.1f}ms")
+        for (metric, label), value in sorted(self.counters.items()):
+            print(f"  {metric}.{label}: {value}")
+
+
+def write_metrics_file(metrics: Metrics, path: Path):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(metrics.to_json(), f, indent=2)
+    tmp.replace(path)  # readers never see a half-written file
+
+
+def serve_metrics(metrics: Metrics, port: int) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.to_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# Time spent opening connections by the current thread's request, so the
+# connect stage can be told apart from the server's response time.
+_connect_time = threading.local()
+
+
+class TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        _connect_time.seconds = getattr(_connect_time, "seconds", 0.0) + time.perf_counter() - started
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        _connect_time.seconds = getattr(_connect_time, "seconds", 0.0) + time.perf_counter() - started
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": TimedHTTPConnectionPool, "https": TimedHTTPSConnectionPool}
+
+
+def make_session(pool_size: int = CONCURRENCY) -> requests.Session:
+    # One pooled session keeps connections alive between products on the same site.
+    session = requests.Session()
+    adapter = TimedAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(HEADERS)
+    return session
+
+
+@functools.lru_cache(maxsize=None)
+def compile_selector(selector: str):
+    return soupsieve.compile(selector)
+
+
+def _jsonld_offer_price(node) -> str | float | None:
+    if isinstance(node, list):
+        for item in node:
+            price = _jsonld_offer_price(item)
+            if price is not None:
+                return price
+    elif isinstance(node, dict):
+        offers = node.get("offers")
+        if offers is not None:
+            for offer in offers if isinstance(offers, list) else [offers]:
+                if isinstance(offer, dict):
+                    price = offer.get("price", offer.get("lowPrice"))
+                    if price is not None:
+                        return price
+        if "@graph" in node:
+            return _jsonld_offer_price(node["@graph"])
+    return None
+
+
+def jsonld_price(html: str) -> tuple[float | None, str]:
+    for match in JSONLD_RE.finditer(html):
+        try:
+            price = _jsonld_offer_price(json.loads(match.group(1)))
+        except json.JSONDecodeError:
+            continue
+        if price is not None:
+            parsed = extract_price(str(price))
+            if parsed is not None:
+                return parsed, "OK"
+            return None, f"Could not parse price from: '{price}'"
+    return None, "No JSON-LD offer price found on page."
+
+
+@functools.lru_cache(maxsize=None)
+def compile_regex(pattern: str) -> re.Pattern:
+    return re.compile(pattern)
+
+
+def regex_price(html: str, pattern: str) -> tuple[float | None, str]:
     try:
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, "html.parser")
-        element = soup.select_one(selector)
+        match = compile_regex(pattern).search(html)
+    except re.error as e:
+        return None, f"Bad regex '{pattern}': {e}"
+    if not match:
+        return None, f"Pattern '{pattern}' not found on page."
+    raw_text = match.group(1) if match.groups() else match.group(0)
+    price = extract_price(raw_text)
+    if price is None:
+        return None, f"Could not parse price from: '{raw_text}'"
+    return price, "OK"
+
+
+def parse_prices(html: str, selectors, parser: str | None = None,
+                 metrics: Metrics | None = None) -> dict[str, tuple[float | None, str]]:
+    if metrics is not None:
+        with metrics.timer("parse"):
+            return parse_prices(html, selectors, parser)
+
+    results = {}
+    css = []
+    for selector in selectors:
+        if selector == JSONLD_SELECTOR:
+            results[selector] = jsonld_price(html)
+        elif selector.startswith(REGEX_PREFIX):
+            results[selector] = regex_price(html, selector[len(REGEX_PREFIX):])
+        else:
+            css.append(selector)
+    if not css:
+        return results  # the page never has to be parsed
+
+    soup = BeautifulSoup(html, parser or DEFAULT_PARSER)
+    for selector in css:
+        try:
+            element = compile_selector(selector).select_one(soup)
+        except soupsieve.SelectorSyntaxError as e:
+            results[selector] = (None, f"Invalid selector '{selector}': {e}")
+            continue
         if not element:
-            return None, f"Selector '{selector}' not found on page."
+            results[selector] = (None, f"Selector '{selector}' not found on page.")
+            continue
         raw_text = element.get_text()
         price = extract_price(raw_text)
         if price is None:
-            return None, f"Could not parse price from: '{raw_text}'"
-        return price, "OK"
+            results[selector] = (None, f"Could not parse price from: '{raw_text}'")
+        else:
+            results[selector] = (price, "OK")
+    return results
+
+
+def fetch_prices(url: str, selectors: list[str], session: requests.Session | None = None,
+                 cached: dict | None = None, parser: str | None = None,
+                 metrics: Metrics | None = None) -> tuple[dict[str, tuple[float | None, str]], dict | None]:
+    """Read every selector from one download of the page.
+
+    When the cache already holds results for all the selectors, the request
+    is conditional and a 304 reuses them without downloading or parsing.
+    Returns the results and the cache entry to keep for the URL (None after
+    a request error).
+    """
+    headers = {} if session is not None else dict(HEADERS)
+    conditional = cached is not None and all(selector in cached["results"] for selector in selectors)
+    if conditional:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+    _connect_time.seconds = 0.0
+    started = time.perf_counter()
+    try:
+        # Streamed, so the wait for the headers and the body download are timed apart.
+        response = (session or requests).get(url, headers=headers, timeout=15, stream=True)
+        if metrics is not None:
+            connect = _connect_time.seconds
+            if connect:
+                metrics.time("connect", connect)
+                metrics.count("connections", "opened")
+            metrics.time("server", time.perf_counter() - started - connect)
+        if response.status_code == 304 and conditional:
+            response.content  # empty; reading it hands the connection back to the pool
+            if metrics is not None:
+                metrics.count("requests", "not_modified")
+            return {selector: tuple(cached["results"][selector]) for selector in selectors}, cached
+        try:
+            response.raise_for_status()
+        except requests.HTTPError:
+            response.close()
+            if metrics is not None:
+                metrics.count("requests", "http_error")
+            raise
+        started = time.perf_counter()
+        html = response.text
+        if metrics is not None:
+            metrics.time("download", time.perf_counter() - started)
+            metrics.count("requests", "ok")
     except requests.RequestException as e:
-        return None, f"Request error: {e}"
+        if metrics is not None and not isinstance(e, requests.HTTPError):
+            metrics.count("requests", "request_error")
+        return {selector: (None, f"Request error: {e}") for selector in selectors}, None
+    results = parse_prices(html, selectors, parser, metrics)
+    entry = {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "results": results,
+    }
+    return results, entry
+
+
+def fetch_price(url: str, selector: str, session: requests.Session | None = None) -> tuple[float | None, str]:
+    results, _ = fetch_prices(url, [selector], session)
+    return results[selector]
+
 
+def load_http_cache(conn: sqlite3.Connection, urls: set[str]) -> dict:
+    cache = {}
+    urls = list(urls)
+    for i in range(0, len(urls), 500):  # stay under SQLite's bound-parameter limit
+        block = urls[i:i + 500]
+        for row in conn.execute(f"SELECT * FROM http_cache WHERE url IN ({','.join('?' * len(block))})", block):
+            cache[row["url"]] = {"etag": row["etag"], "last_modified": row["last_modified"],
+                                 "results": json.loads(row["results"])}
+    return cache
 
-def log_history(name: str, url: str, price: float, target: float, alerted: bool):
-    file_exists = HISTORY_FILE.exists()
-    with open(HISTORY_FILE, "a", newline="") as f:
-        writer = csv.writer(f)
-        if not file_exists:
-            writer.writerow(["timestamp", "name", "url", "price", "target", "alert_triggered"])
-        writer.writerow([
-            datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            name, url, price, target, alerted
-        ])
+
+def save_http_cache(conn: sqlite3.Connection, cache: dict):
+    conn.executemany(
+        "INSERT OR REPLACE INTO http_cache (url, etag, last_modified, results) VALUES (?, ?, ?, ?)",
+        ((url, e["etag"], e["last_modified"], json.dumps(e["results"])) for url, e in cache.items()),
+    )
+
+
+def save_check_results(conn: sqlite3.Connection, checked: list[tuple[dict, float, bool]], cache: dict | None):
+    # One transaction per check run, however many products were checked.
+    timestamp = datetime.now().strftime(TIME_FORMAT)
+    with conn:
+        conn.executemany(
+            "UPDATE products SET last_price = ?, last_checked = ? WHERE id = ?",
+            ((p["last_price"], p["last_checked"], p["id"]) for p, _, _ in checked),
+        )
+        conn.executemany(
+            "INSERT INTO history (timestamp, name, url, price, target, alert_triggered) VALUES (?, ?, ?, ?, ?, ?)",
+            ((timestamp, p["name"], p["url"], price, p["target_price"], int(alerted)) for p, price, alerted in checked),
+        )
+        if cache is not None:
+            save_http_cache(conn, cache)
+    refresh_rollups(conn)
 
 
 def cmd_add(args):
-    data = load_data()
-    names = [p["name"] for p in data["products"]]
-    if args.name in names:
+    conn = open_store()
+    try:
+        with conn:
+            conn.execute(
+                "INSERT INTO products (name, url, selector, target_price, added) VALUES (?, ?, ?, ?, ?)",
+                (args.name, args.url, args.selector, args.target, datetime.now().isoformat()),
+            )
+    except sqlite3.IntegrityError:
         print(f"A product named '{args.name}' already exists. Use a different name.")
         return
-    product = {
-        "name": args.name,
-        "url": args.url,
-        "selector": args.selector,
-        "target_price": args.target,
-        "added": datetime.now().isoformat(),
-        "last_price": None,
-        "last_checked": None,
-    }
-    data["products"].append(product)
-    save_data(data)
+    finally:
+        conn.close()
     print(f"Added: '{args.name}' — target price ${args.target}")
 
 
 def cmd_list(args):
-    data = load_data()
-    if not data["products"]:
+    conn = open_store()
+    products = load_products(conn)
+    conn.close()
+    if not products:
         print("No products being tracked. Use 'add' to start.")
         return
     print(f"\n{'Name':<20} {'Target':>8} {'Last Price':>12} {'Last Checked':<20}")
     print("-" * 65)
-    for p in data["products"]:
+    for p in products:
         last_price = f"${p['last_price']:.2f}" if p["last_price"] else "Not checked"
         last_checked = p["last_checked"][:16] if p["last_checked"] else "Never"
         print(f"{p['name']:<20} ${p['target_price']:>7.2f} {last_price:>12} {last_checked:<20}")
     print()
 
 
+def check_products(products: list[dict], concurrency: int = CONCURRENCY, per_host: int = PER_HOST,
+                   host_rate: float = HOST_RATE, cache: dict | None = None, parser: str | None = None,
+                   metrics: Metrics | None = None, session: requests.Session | None = None):
+    """Fetch every product's price concurrently; yields (product, price, status) in list order.
+
+    Products that share a URL share one request. Pass an HTTP cache dict
+    (see load_http_cache) to make conditional requests; it is updated in place.
+    Pass a session to keep its connections alive across calls.
+    """
+    limiter = HostLimiter(per_host, host_rate)
+    concurrency = max(concurrency, 1)
+    selectors = {}
+    for product in products:
+        selectors.setdefault(product["url"], {})[product["selector"]] = None
+
+    def task(url):
+        if metrics is not None:
+            metrics.time("queue", time.perf_counter() - queued)
+        cached = cache.get(url) if cache is not None else None
+        return fetch_prices(url, list(selectors[url]), session, cached, parser, metrics)
+
+    own_session = session is None
+    if own_session:
+        session = make_session(concurrency)
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            queued = time.perf_counter()
+            futures = limiter.submit_all(pool, selectors, task)
+            try:
+                for product in products:
+                    results, entry = futures[product["url"]].result()
+                    if cache is not None and entry is not None:
+                        cache[product["url"]] = entry
+                    price, status = results[product["selector"]]
+                    if metrics is not None:
+                        metrics.count_result(price, status)
+                    yield product, price, status
+            finally:
+                limiter.close()
+    finally:
+        if own_session:
+            session.close()
+
+
 def cmd_check(args):
-    data = load_data()
-    if not data["products"]:
+    conn = open_store()
+    products = load_products(conn)
+    if not products:
+        conn.close()
         print("No products to check.")
         return
+    metrics = Metrics()
+    run_check(conn, products, args, metrics)
+    conn.close()
+    if args.timing:
+        metrics.print_summary()
+    if args.metrics_file:
+        write_metrics_file(metrics, Path(args.metrics_file))
+
+
+def print_alerts(alerts: list[dict]):
+    print(f"\n{'='*50}")
+    print(f"PRICE ALERTS: {len(alerts)} product(s) hit target price!")
+    for p in alerts:
+        print(f"  → {p['name']}: ${p['last_price']:.2f} (target: ${p['target_price']:.2f})")
+        print(f"    {p['url']}")
+    print(f"{'='*50}\n", flush=True)
+
+
+def run_check(conn: sqlite3.Connection, products: list[dict], args, metrics: Metrics | None = None,
+              alert_sink=None, session: requests.Session | None = None) -> list[tuple[dict, float | None]]:
+    """Check the given products, print the results and alerts, and store them.
 
+    With alert_sink, the alerted products are passed to it instead of being
+    printed as a summary.
+    """
+    started = time.perf_counter()
+    urls = {p["url"] for p in products}
+    cache = None if args.no_cache else load_http_cache(conn, urls)
+    results = []
     alerts = []
-    for product in data["products"]:
-        print(f"Checking: {product['name']}...", end=" ", flush=True)
-        price, status = fetch_price(product["url"], product["selector"])
+    checked = []
+    for product, price, status in check_products(products, args.concurrency, args.per_host,
+                                                 args.host_rate, cache, args.parser, metrics, session):
+        # Each product is one print call, so lines from shard workers don't interleave.
+        line = f"Checking: {product['name']}..."
+        results.append((product, price))
 
         if price is None:
-            print(f"FAILED — {status}")
+            print(f"{line} FAILED — {status}", flush=True)
             continue
 
         product["last_price"] = price
         product["last_checked"] = datetime.now().isoformat()
 
         alerted = price <= product["target_price"]
-        log_history(product["name"], product["url"], price, product["target_price"], alerted)
+        checked.append((product, price, alerted))
 
         if alerted:
-            print(f"ALERT! ${price:.2f} (target: ${product['target_price']:.2f}) ← PRICE DROP!")
+            print(f"{line} ALERT! ${price:.2f} (target: ${product['target_price']:.2f}) ← PRICE DROP!", flush=True)
             alerts.append(product)
         else:
             diff = price - product["target_price"]
-            print(f"${price:.2f} (target: ${product['target_price']:.2f}, ${diff:.2f} above target)")
+            print(f"{line} ${price:.2f} (target: ${product['target_price']:.2f}, ${diff:.2f} above target)",
+                  flush=True)
 
-    save_data(data)
+    save_check_results(conn, checked, cache)
 
-    if alerts:
-        print(f"\n{'='*50}")
-        print(f"PRICE ALERTS: {len(alerts)} product(s) hit target price!")
-        for p in alerts:
-            print(f"  → {p['name']}: ${p['last_price']:.2f} (target: ${p['target_price']:.2f})")
-            print(f"    {p['url']}")
-        print(f"{'='*50}\n")
+    if alert_sink is not None:
+        if alerts:
+            alert_sink(alerts)
+    elif alerts:
+        print_alerts(alerts)
     else:
         print("\nNo price alerts triggered.")
+    if metrics is not None:
+        metrics.finish_run(time.perf_counter() - started)
+    return results
+
+
+def next_interval(state: dict, changed: bool | None, base: float) -> float:
+    """Seconds until a page's next check; changed is None when the check failed."""
+    low, high = base * MIN_INTERVAL_FACTOR, base * MAX_INTERVAL_FACTOR
+    if changed is None:
+        # Exponential backoff for failing sites, without touching the learned interval.
+        state["failures"] += 1
+        interval = min(high, state["interval"] * 2 ** state["failures"])
+    else:
+        state["failures"] = 0
+        factor = SPEEDUP if changed else SLOWDOWN
+        state["interval"] = interval = min(high, max(low, state["interval"] * factor))
+    return interval * random.uniform(1 - JITTER, 1 + JITTER)
+
+
+def shard_ring(shards: int) -> tuple[list[int], list[int]]:
+    points = sorted(
+        (int.from_bytes(hashlib.sha1(f"shard-{shard}-{vnode}".encode()).digest()[:8], "big"), shard)
+        for shard in range(shards) for vnode in range(SHARD_VNODES)
+    )
+    return [point for point, _ in points], [shard for _, shard in points]
+
+
+def shard_of(name: str, ring: tuple[list[int], list[int]]) -> int:
+    # Adding or removing a shard only moves the products next to its points on the ring.
+    points, owners = ring
+    key = int.from_bytes(hashlib.sha1(name.encode()).digest()[:8], "big")
+    return owners[bisect.bisect(points, key) % len(points)]
+
+
+def acquire_leases(conn: sqlite3.Connection, products: list[dict], owner: str) -> list[dict]:
+    now = time.time()
+    leased = []
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        for product in products:
+            taken = conn.execute(
+                "INSERT INTO leases (product_id, owner, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT (product_id) DO UPDATE SET owner = excluded.owner, expires = excluded.expires "
+                "WHERE leases.expires < ? OR leases.owner = excluded.owner",
+                (product["id"], owner, now + LEASE_SECONDS, now),
+            ).rowcount
+            if taken:
+                leased.append(product)
+    return leased
+
+
+def release_leases(conn: sqlite3.Connection, products: list[dict], owner: str):
+    with conn:
+        conn.executemany(
+            "DELETE FROM leases WHERE product_id = ? AND owner = ?", ((p["id"], owner) for p in products)
+        )
+
+
+def watch_loop(conn: sqlite3.Connection, args, metrics: Metrics, shard: int | None = None, alert_sink=None):
+    """The adaptive scheduler. With a shard, only that shard's products are
+    checked, each under a lease."""
+    base = args.interval * 60
+    ring = shard_ring(args.shards) if shard is not None else None
+    owner = f"{os.getpid()}:{shard}"
+    # Scheduled per URL, so products on the same page are always checked
+    # together with one request.
+    due_heap = []  # (due time, url); one entry per tracked URL
+    states = {}
+    session = make_session(args.concurrency)  # keeps connections alive from one run to the next
+    try:
+        while True:
+            pages = {}
+            for p in load_products(conn):
+                if ring is None or shard_of(p["name"], ring) == shard:
+                    pages.setdefault(p["url"], []).append(p)
+            for url in pages.keys() - states.keys():
+                states[url] = {"interval": base, "failures": 0}
+                heapq.heappush(due_heap, (time.time(), url))
+
+            due = []
+            horizon = time.time() + min(COALESCE_SECONDS, base * JITTER)
+            while due_heap and due_heap[0][0] <= horizon:
+                _, url = heapq.heappop(due_heap)
+                if url in pages:
+                    due.extend(pages[url])
+                else:
+                    del states[url]  # removed (or moved to another shard) since it was scheduled
+
+            if due and shard is not None:
+                leased = acquire_leases(conn, due, owner)
+                # Someone else holds these; look again once their lease could have run out.
+                for url in {p["url"] for p in due} - {p["url"] for p in leased}:
+                    heapq.heappush(due_heap, (time.time() + LEASE_SECONDS, url))
+                due = leased
+
+            if due:
+                label = f"shard {shard}: " if shard is not None else ""
+                print(f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {label}Checking {len(due)} due product(s)...")
+                previous = {p["id"]: p["last_price"] for p in due}
+                try:
+                    results = run_check(conn, due, args, metrics, alert_sink, session)
+                finally:
+                    if shard is not None:
+                        release_leases(conn, due, owner)
+                outcomes = {}  # url -> changed per product that got a price
+                for product, price in results:
+                    before = previous[product["id"]]
+                    seen = outcomes.setdefault(product["url"], [])
+                    if price is not None:
+                        seen.append(before is not None and price != before)
+                for url, seen in outcomes.items():
+                    changed = any(seen) if seen else None
+                    heapq.heappush(due_heap, (time.time() + next_interval(states[url], changed, base), url))
+                if args.metrics_file:
+                    write_metrics_file(metrics, shard_path(Path(args.metrics_file), shard))
+                if args.timing:
+                    metrics.print_summary()
+                if due_heap and shard is None:
+                    next_due = datetime.fromtimestamp(due_heap[0][0]).strftime("%H:%M:%S")
+                    print(f"Next check at {next_due}.")
+
+            wait = due_heap[0][0] - time.time() if due_heap else RELOAD_SECONDS
+            time.sleep(min(max(wait, 0), RELOAD_SECONDS))
+    finally:
+        session.close()
+
+
+def shard_path(path: Path, shard: int | None) -> Path:
+    return path if shard is None else path.with_name(f"{path.stem}.shard{shard}{path.suffix}")
+
+
+def shard_worker(shard: int, args, alerts):
+    conn = open_store()
+    metrics = Metrics()
+    server = None
+    if args.metrics_port:
+        try:
+            server = serve_metrics(metrics, args.metrics_port + shard)
+        except OSError as e:
+            print(f"Error: shard {shard} cannot serve metrics on port {args.metrics_port + shard} — {e}")
+    try:
+        watch_loop(conn, args, metrics, shard, lambda products: alerts.put((shard, [
+            {k: p[k] for k in ("name", "url", "last_price", "target_price")} for p in products
+        ])))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if server is not None:
+            server.shutdown()
+        conn.close()
+
+
+def watch_sharded(args):
+    # Runs any pending migration once, before the workers open the store together.
+    open_store().close()
+    alerts = multiprocessing.Queue()
+    workers = {}
+
+    def start(shard):
+        worker = multiprocessing.Process(target=shard_worker, args=(shard, args, alerts), daemon=True)
+        worker.start()
+        workers[shard] = worker
+
+    for shard in range(args.shards):
+        start(shard)
+    if args.metrics_port:
+        print(f"Prometheus metrics at http://localhost:{args.metrics_port}-{args.metrics_port + args.shards - 1}/metrics\n")
+    try:
+        while True:
+            # Alerts that arrive close together are reported as one block.
+            try:
+                batch = [alerts.get(timeout=5)]
+            except queue.Empty:
+                batch = []
+            time.sleep(0.5 if batch else 0)
+            while True:
+                try:
+                    batch.append(alerts.get_nowait())
+                except queue.Empty:
+                    break
+            if batch:
+                print_alerts([alert for _, products in batch for alert in products])
+            for shard, worker in list(workers.items()):
+                if not worker.is_alive():
+                    print(f"Shard {shard} stopped (exit code {worker.exitcode}); restarting it.", flush=True)
+                    start(shard)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        signal.signal(signal.SIGINT, signal.SIG_IGN)  # a second Ctrl+C must not orphan workers
+        for worker in workers.values():
+            worker.terminate()
+        for worker in workers.values():
+            worker.join()
 
 
 def cmd_watch(args):
-    print(f"Starting price monitor (interval: {args.interval} minutes). Press Ctrl+C to stop.\n")
-    while True:
-        print(f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Running price check...")
-        cmd_check(args)
-        print(f"Next check in {args.interval} minutes...")
-        time.sleep(args.interval * 60)
+    if args.shards > 1:
+        print(f"Starting price monitor with {args.shards} worker processes "
+              f"(base interval: {args.interval} minutes). Press Ctrl+C to stop.\n")
+        watch_sharded(args)
+        return
+    print(f"Starting price monitor (base interval: {args.interval} minutes). Press Ctrl+C to stop.\n")
+    conn = open_store()
+    metrics = Metrics()
+    server = None
+    if args.metrics_port:
+        try:
+            server = serve_metrics(metrics, args.metrics_port)
+        except OSError as e:
+            print(f"Error: cannot serve metrics on port {args.metrics_port} — {e}")
+            conn.close()
+            return
+        print(f"Prometheus metrics at http://localhost:{args.metrics_port}/metrics\n")
+    try:
+        watch_loop(conn, args, metrics)
+    finally:
+        if server is not None:
+            server.shutdown()
+        conn.close()
 
 
-def cmd_history(args):
-    if not HISTORY_FILE.exists():
+def refresh_rollups(conn: sqlite3.Connection):
+    """Fold history rows added since the last refresh into the rollup tables."""
+    with conn:
+        # Take the write lock before reading the watermark, so concurrent
+        # watch workers never fold the same rows twice.
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT value FROM meta WHERE key = 'rollup_upto'").fetchone()
+        done = int(row[0]) if row else 0
+        top = conn.execute("SELECT max(id) FROM history").fetchone()[0] or 0
+        if top <= done:
+            return
+        for bucket, start in ROLLUP_BUCKETS.items():
+            conn.execute(f"""
+                INSERT INTO rollups (bucket, name, start, n, total, low, high)
+                SELECT ?, name, {start}, count(*), sum(price), min(price), max(price)
+                FROM history WHERE id > ? AND id <= ?
+                GROUP BY name, {start}
+                ON CONFLICT (bucket, name, start) DO UPDATE SET
+                    n = n + excluded.n, total = total + excluded.total,
+                    low = min(low, excluded.low), high = max(high, excluded.high)
+            """, (bucket, done, top))
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('rollup_upto', ?)", (str(top),))
+
+
+def product_stats(conn: sqlite3.Connection, name: str, now: datetime) -> dict | None:
+    # Every query is an index seek or a range scan over one product's rollups.
+    latest = conn.execute(
+        "SELECT timestamp, price FROM history WHERE name = ? ORDER BY timestamp DESC LIMIT 1", (name,)
+    ).fetchone()
+    if latest is None:
+        return None
+    low, high = conn.execute(
+        "SELECT min(low), max(high) FROM rollups WHERE bucket = 'week' AND name = ?", (name,)
+    ).fetchone()
+
+    def average(days: int) -> float | None:
+        since = (now - timedelta(days=days)).strftime("%Y-%m-%d")
+        return conn.execute(
+            "SELECT sum(total) / sum(n) FROM rollups WHERE bucket = 'day' AND name = ? AND start >= ?", (name, since)
+        ).fetchone()[0]
+
+    week_ago = conn.execute(
+        "SELECT price FROM history WHERE name = ? AND timestamp <= ? ORDER BY timestamp DESC LIMIT 1",
+        (name, (now - timedelta(days=7)).strftime(TIME_FORMAT)),
+    ).fetchone()
+
+    # The latest hour that reached the all-time low, then the exact row inside it.
+    low_hour = conn.execute(
+        "SELECT max(start) FROM rollups WHERE bucket = 'hour' AND name = ? AND low = ?", (name, low)
+    ).fetchone()[0]
+    low_at = conn.execute(
+        "SELECT max(timestamp) FROM history WHERE name = ? AND timestamp >= ? AND timestamp < ? AND price = ?",
+        (name, low_hour, (datetime.strptime(low_hour, TIME_FORMAT) + timedelta(hours=1)).strftime(TIME_FORMAT), low),
+    ).fetchone()[0]
+
+    return {
+        "price": latest["price"],
+        "low": low,
+        "high": high,
+        "avg_7d": average(7),
+        "avg_30d": average(30),
+        "change_7d": (latest["price"] - week_ago[0]) / week_ago[0] * 100 if week_ago and week_ago[0] else None,
+        "since_low": now - datetime.strptime(low_at, TIME_FORMAT),
+    }
+
+
+def format_age(age: timedelta) -> str:
+    if age.days:
+        return f"{age.days}d {age.seconds // 3600}h"
+    if age.seconds >= 3600:
+        return f"{age.seconds // 3600}h {age.seconds % 3600 // 60}m"
+    return f"{age.seconds // 60}m"
+
+
+def cmd_stats(args):
+    conn = open_store()
+    refresh_rollups(conn)
+
+    if args.name:
+        rows = conn.execute(
+            "SELECT * FROM rollups WHERE bucket = ? AND name = ? ORDER BY start DESC LIMIT ?",
+            (args.bucket, args.name, args.limit),
+        ).fetchall()
+        conn.close()
+        if not rows:
+            print(f"No history found for '{args.name}'.")
+            return
+        print(f"\nPrice by {args.bucket} for: {args.name}")
+        print("-" * 60)
+        print(f"{'Start':<22} {'Checks':>7} {'Average':>9} {'Low':>9} {'High':>9}")
+        print("-" * 60)
+        for row in reversed(rows):
+            print(f"{row['start']:<22} {row['n']:>7} ${row['total'] / row['n']:>8.2f} "
+                  f"${row['low']:>8.2f} ${row['high']:>8.2f}")
+        print()
+        return
+
+    now = datetime.now()
+    stats = [(p["name"], product_stats(conn, p["name"], now)) for p in load_products(conn)]
+    conn.close()
+    stats = [(name, st) for name, st in stats if st is not None]
+    if not stats:
         print("No history recorded yet.")
         return
+
+    def money(value):
+        return f"${value:.2f}" if value is not None else "—"
+
+    print(f"\n{'Name':<20} {'Price':>9} {'Low':>9} {'High':>9} {'Avg 7d':>9} {'Avg 30d':>9} {'7d %':>7} {'Since low':>10}")
+    print("-" * 90)
+    for name, st in stats:
+        change = f"{st['change_7d']:+.1f}%" if st["change_7d"] is not None else "—"
+        since_low = "at low" if st["price"] <= st["low"] else format_age(st["since_low"])
+        print(f"{name:<20} {money(st['price']):>9} {money(st['low']):>9} {money(st['high']):>9} "
+              f"{money(st['avg_7d']):>9} {money(st['avg_30d']):>9} {change:>7} {since_low:>10}")
+    print()
+
+
+def cmd_history(args):
+    conn = open_store()
+    # Both queries walk an index backwards from the newest row.
+    if args.name:
+        rows = conn.execute(
+            "SELECT * FROM history WHERE name = ? ORDER BY timestamp DESC, id DESC LIMIT 20", (args.name,)
+        ).fetchall()
+    else:
+        rows = conn.execute("SELECT * FROM history ORDER BY timestamp DESC, id DESC LIMIT 20").fetchall()
+    conn.close()
     print(f"\nPrice history for: {args.name or 'all products'}")
     print("-" * 75)
-    with open(HISTORY_FILE, "r") as f:
-        reader = csv.DictReader(f)
-        rows = [r for r in reader if not args.name or r["name"] == args.name]
     if not rows:
         print("No history found.")
         return
     print(f"{'Timestamp':<22} {'Name':<20} {'Price':>8} {'Target':>8} {'Alert'}")
     print("-" * 75)
-    for row in rows[-20:]:
-        alert = "YES!" if row["alert_triggered"] == "True" else ""
-        print(f"{row['timestamp']:<22} {row['name']:<20} ${float(row['price']):>7.2f} ${float(row['target']):>7.2f} {alert}")
+    for row in reversed(rows):
+        alert = "YES!" if row["alert_triggered"] else ""
+        print(f"{row['timestamp']:<22} {row['name']:<20} ${row['price']:>7.2f} ${row['target']:>7.2f} {alert}")
+    print()
+
+
+def save_fixtures(folder: Path, products: list[dict]) -> list[dict]:
+    selectors = {}
+    for product in products:
+        selectors.setdefault(product["url"], {})[product["selector"]] = None
+    folder.mkdir(parents=True, exist_ok=True)
+    fixtures = []
+    with make_session() as session:
+        for i, (url, sels) in enumerate(selectors.items(), 1):
+            print(f"Saving: {url}...", end=" ", flush=True)
+            try:
+                response = session.get(url, timeout=15)
+                response.raise_for_status()
+            except requests.RequestException as e:
+                print(f"FAILED — {e}")
+                continue
+            name = f"page_{i:04d}.html"
+            (folder / name).write_text(response.text, encoding="utf-8")
+            fixtures.append({"file": name, "url": url, "selectors": list(sels)})
+            print("OK")
+    with open(folder / "fixtures.json", "w") as f:
+        json.dump(fixtures, f, indent=2)
+    return fixtures
+
+
+def cmd_bench(args):
+    folder = Path(args.fixtures)
+    if (folder / "fixtures.json").exists():
+        with open(folder / "fixtures.json", "r") as f:
+            fixtures = json.load(f)
+    else:
+        print(f"No fixtures in {folder} yet — downloading the tracked product pages once.")
+        conn = open_store()
+        fixtures = save_fixtures(folder, load_products(conn))
+        conn.close()
+    pages = [((folder / fx["file"]).read_text(encoding="utf-8"), fx["selectors"]) for fx in fixtures]
+    if not pages:
+        print("No pages to benchmark. Add products first, or point --fixtures at saved pages.")
+        return
+
+    def backend(parser):
+        def run(html, selectors):
+            return {s: price for s, (price, _) in parse_prices(html, selectors, parser).items()}
+        return run
+
+    def per_product(html, selectors):
+        # What every check did before: a full html.parser tree for each product,
+        # with the selector compiled again each time.
+        results = {}
+        for selector in selectors:
+            if selector == JSONLD_SELECTOR or selector.startswith(REGEX_PREFIX):
+                results.update(backend("html.parser")(html, [selector]))
+                continue
+            try:
+                element = BeautifulSoup(html, "html.parser").select_one(selector)
+            except soupsieve.SelectorSyntaxError:
+                element = None
+            results[selector] = extract_price(element.get_text()) if element else None
+        return results
+
+    backends = [("html.parser, per product", per_product), ("html.parser, per page", backend("html.parser"))]
+    if DEFAULT_PARSER == "lxml":
+        backends.append(("lxml, per page", backend("lxml")))
+    else:
+        print("lxml is not installed; skipping it (pip install lxml).")
+    backends.append(("json-ld fast path", lambda html, selectors: {s: jsonld_price(html)[0] for s in selectors}))
+
+    baseline = [backend("html.parser")(html, selectors) for html, selectors in pages]
+    print(f"\n{len(pages)} page(s), {args.repeat} round(s) each")
+    print(f"{'Backend':<28} {'ms/page':>9} {'pages/s':>9} {'Same price':>11}")
+    print("-" * 60)
+    for label, run in backends:
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            results = [run(html, selectors) for html, selectors in pages]
+        elapsed = time.perf_counter() - started
+        per_page = elapsed / (args.repeat * len(pages))
+        same = sum(1 for got, want in zip(results, baseline) if got == want)
+        print(f"{label:<28} {per_page * 1000:>9.2f} {1 / per_page:>9.1f} {same:>5}/{len(pages)}")
     print()
 
 
 def cmd_remove(args):
-    data = load_data()
-    before = len(data["products"])
-    data["products"] = [p for p in data["products"] if p["name"] != args.name]
-    if len(data["products"]) < before:
-        save_data(data)
+    conn = open_store()
+    with conn:
+        removed = conn.execute("DELETE FROM products WHERE name = ?", (args.name,)).rowcount
+        conn.execute("DELETE FROM http_cache WHERE url NOT IN (SELECT url FROM products)")
+    conn.close()
+    if removed:
         print(f"Removed: '{args.name}'")
     else:
         print(f"Product '{args.name}' not found.")
@@ -222,24 +1308,62 @@ def main():
     # add
     p_add = subparsers.add_parser("add", help="Add a product to monitor")
     p_add.add_argument("--url", required=True)
-    p_add.add_argument("--selector", required=True, help="CSS selector for the price element")
+    p_add.add_argument("--selector", required=True,
+                       help=f"CSS selector for the price element, '{JSONLD_SELECTOR}' for the page's structured "
+                            f"data, or '{REGEX_PREFIX}PATTERN' to match the page source (first group is the price)")
     p_add.add_argument("--target", type=float, required=True, help="Alert when price drops to this value")
     p_add.add_argument("--name", required=True, help="Friendly name for this product")
 
     # list
     subparsers.add_parser("list", help="List all tracked products")
 
+    # options shared by check and watch
+    check_opts = argparse.ArgumentParser(add_help=False)
+    check_opts.add_argument("--concurrency", type=int, default=CONCURRENCY,
+                            help=f"Requests in flight at once (default: {CONCURRENCY})")
+    check_opts.add_argument("--per-host", type=int, default=PER_HOST,
+                            help=f"Requests in flight to any one site (default: {PER_HOST})")
+    check_opts.add_argument("--host-rate", type=float, default=HOST_RATE,
+                            help=f"New requests per second to any one site, 0 for no limit (default: {HOST_RATE:g})")
+    check_opts.add_argument("--parser", choices=["lxml", "html.parser"], default=DEFAULT_PARSER,
+                            help=f"HTML parser for CSS selectors (default: {DEFAULT_PARSER})")
+    check_opts.add_argument("--timing", action="store_true",
+                            help="Print time per stage (queue, connect, server, download, parse) and result counts")
+    check_opts.add_argument("--metrics-file",
+                            help="Write timings and counters as JSON to this file after every check run")
+    check_opts.add_argument("--no-cache", action="store_true",
+                            help="Always download full pages instead of asking whether they changed")
+
     # check
-    subparsers.add_parser("check", help="Check all prices once")
+    subparsers.add_parser("check", parents=[check_opts], help="Check all prices once")
 
     # watch
-    p_watch = subparsers.add_parser("watch", help="Continuously monitor prices")
-    p_watch.add_argument("--interval", type=int, default=60, help="Check interval in minutes (default: 60)")
+    p_watch = subparsers.add_parser("watch", parents=[check_opts], help="Continuously monitor prices")
+    p_watch.add_argument("--interval", type=float, default=60,
+                         help=f"Typical check interval per product in minutes; adapts between "
+                              f"{MIN_INTERVAL_FACTOR:g}x and {MAX_INTERVAL_FACTOR:g}x (default: 60)")
+    p_watch.add_argument("--metrics-port", type=int,
+                         help="Serve Prometheus metrics at http://localhost:PORT/metrics (shard N uses PORT+N)")
+    p_watch.add_argument("--shards", type=int, default=1,
+                         help="Split the products across this many worker processes (default: 1)")
 
     # history
     p_hist = subparsers.add_parser("history", help="Show price history")
     p_hist.add_argument("--name", default=None, help="Filter by product name")
 
+    # stats
+    p_stats = subparsers.add_parser("stats", help="Price statistics from the full history")
+    p_stats.add_argument("--name", default=None, help="Show one product's prices grouped by --bucket")
+    p_stats.add_argument("--bucket", choices=list(ROLLUP_BUCKETS), default="day",
+                         help="Time bucket for --name (default: day)")
+    p_stats.add_argument("--limit", type=int, default=30, help="Most recent buckets to show (default: 30)")
+
+    # bench
+    p_bench = subparsers.add_parser("bench", help="Compare HTML parsing speed on saved pages")
+    p_bench.add_argument("--fixtures", default="price_fixtures",
+                         help="Folder of saved pages; filled from the tracked products if empty (default: price_fixtures)")
+    p_bench.add_argument("--repeat", type=int, default=5, help="Rounds over the pages (default: 5)")
+
     # remove
     p_remove = subparsers.add_parser("remove", help="Remove a tracked product")
     p_remove.add_argument("--name", required=True)
@@ -252,9 +1376,15 @@ def main():
         "check": cmd_check,
         "watch": cmd_watch,
         "history": cmd_history,
+        "stats": cmd_stats,
+        "bench": cmd_bench,
         "remove": cmd_remove,
     }
 
+    if getattr(args, "parser", None) == "lxml" and DEFAULT_PARSER != "lxml":
+        print("Missing dependency for --parser lxml. Please run: pip install lxml")
+        return
+
     if args.command in commands:
         commands[args.command](args)
     else: